@@ -0,0 +1,20 @@
+"""Micro-benchmarks for the fragments, run from the repository root, e.g.
+`python -m benchmarks.compiled_fragments`, or all tags and filters against a baseline
+with `python -m benchmarks.suite`."""
+import os
+import timeit
+from collections.abc import Callable
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+django.setup()
+
+
+def per_call(fn: Callable, number: int = 1000, repeat: int = 5) -> float:
+    """Best of `repeat` runs, in microseconds per call."""
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+
+
+def report(label: str, before: float, after: float):
+    print(f"{label:<16} {before:>10.1f}us {after:>10.1f}us {before / after:>8.1f}x")
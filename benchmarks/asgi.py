@@ -0,0 +1,129 @@
+"""Requests per second of the demo pages served by uvicorn, through the ASGI
+application, whose views are async, and through the WSGI one:
+
+    python -m benchmarks.asgi
+    python -m benchmarks.asgi -c 100 -d 10 --workers 2
+
+Each server runs `config.bench_settings`, i.e. `DEBUG` off and no debug toolbar, and
+is loaded by `-c` keep-alive connections, each requesting the pages in turn for `-d`
+seconds. Requires uvicorn, a dev dependency."""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from config.wsgi import application
+
+PAGES = ("/", "/about/", "/contact/")
+APPLICATIONS = {
+    "asgi": ["config.asgi:application"],
+    "wsgi": ["benchmarks.asgi:wsgi_application", "--interface", "wsgi"],
+}
+
+
+def wsgi_application(environ, start_response):
+    """`config.wsgi`'s application with its header values stripped: Django starts
+    `Set-Cookie` with a space, which uvicorn's WSGI adapter passes on and h11 rejects.
+    """
+
+    def start(status, headers, exc_info=None):
+        return start_response(status, [(k, v.strip()) for k, v in headers], exc_info)
+
+    return application(environ, start)
+
+
+@contextmanager
+def server(interface: str, port: int, workers: int) -> Iterator[None]:
+    """A uvicorn process serving the `interface` application on `port`."""
+    env = os.environ | {"DJANGO_SETTINGS_MODULE": "config.bench_settings"}
+    command = [sys.executable, "-m", "uvicorn", *APPLICATIONS[interface]]
+    command += ["--port", str(port), "--workers", str(workers)]
+    command += ["--log-level", "warning", "--no-access-log"]
+    process = subprocess.Popen(command, env=env)
+    try:
+        asyncio.run(wait_for(port))
+        yield
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def wait_for(port: int, timeout: float = 15) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+        else:
+            writer.close()
+            return
+
+
+async def fetch(reader, writer, path: str) -> int:
+    """Request `path` on an open connection and read the whole response."""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode())
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    for line in head.split(b"\r\n"):
+        name, _, value = line.partition(b":")
+        if name.lower() == b"content-length":
+            await reader.readexactly(int(value))
+            return status
+    raise ValueError(f"{path}: response without a Content-Length")
+
+
+async def connection(port: int, until: float) -> tuple[int, int]:
+    """Number of responses, and of those not 200, before the monotonic `until`."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    done = errors = 0
+    try:
+        while time.monotonic() < until:
+            errors += await fetch(reader, writer, PAGES[done % len(PAGES)]) != 200
+            done += 1
+    finally:
+        writer.close()
+    return done, errors
+
+
+async def load(port: int, connections: int, duration: float) -> tuple[float, int]:
+    """Requests per second over `connections` concurrent clients, and the errors."""
+    for path in PAGES:  # warm the templates and caches of each page
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await fetch(reader, writer, path)
+        writer.close()
+    start = time.monotonic()
+    results = await asyncio.gather(
+        *(connection(port, start + duration) for _ in range(connections))
+    )
+    elapsed = time.monotonic() - start
+    return sum(d for d, _ in results) / elapsed, sum(e for _, e in results)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-c", "--connections", type=int, default=50)
+    parser.add_argument("-d", "--duration", type=float, default=5)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--only", choices=APPLICATIONS)
+    args = parser.parse_args(argv)
+    failed = 0
+    for interface in APPLICATIONS:
+        if args.only and interface != args.only:
+            continue
+        with server(interface, args.port, args.workers):
+            rps, errors = asyncio.run(load(args.port, args.connections, args.duration))
+        print(f"{interface:<6} {rps:>10.1f} req/s {errors:>6} errors")
+        failed += errors
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Per-call cost of `toggle_icons`, `hput` and `htmx_csrf` when their templates are
+compiled on every call (the previous implementation, reproduced here) versus once."""
+from django.template import Context, Template
+from django.utils.safestring import mark_safe
+
+from django_fragments.forms import ContactForm
+from django_fragments.templatetags.fragments import (
+    TOGGLE_ICONS_HTML,
+    hput,
+    icon,
+    toggle_icons,
+)
+from django_fragments.templatetags.helpers import htmx_csrf
+
+from . import per_call, report
+
+HPUT_HTML = """
+    {% load fragments %}{% whitespaceless %}
+    <div {{attrs}}
+        {% if bound.is_hidden %}hidden{% endif %}
+        {% if bound.errors %}data-invalid=true{% endif %}
+        class="{{ kls }}"
+        data-widget="{{ bound.widget_type }}"
+    >
+        <label for="{{ bound.id_for_label }}"
+            {% if label_kls %}class="{{ label_kls }}"{% endif %}>
+            {{bound.label}}
+        </label>
+        {{ bound }}
+        <small>{{ bound.help_text }}</small>
+        {% if bound.errors %}{{ bound.errors }}{% endif %}
+    </div>
+    {% endwhitespaceless %}
+    """
+
+
+def toggle_icons_per_call():
+    return mark_safe(
+        Template(TOGGLE_ICONS_HTML)
+        .render(
+            Context(
+                {
+                    "btn_kls": "theme-toggler",
+                    "aria_label": "Toggle mode",
+                    "icon1": icon(name="sun"),
+                    "icon2": icon(name="moon"),
+                }
+            )
+        )
+        .strip()
+    )
+
+
+def hput_per_call(bound):
+    return mark_safe(
+        Template(HPUT_HTML)
+        .render(Context({"bound": bound, "label_kls": None, "kls": "h", "attrs": ""}))
+        .strip()
+    )
+
+
+def htmx_csrf_per_call(context):
+    return mark_safe(
+        Template("""hx-headers='{"X-CSRFToken": "{{ csrf_token }}"}'""").render(
+            context=Context(context)
+        )
+    )
+
+
+if __name__ == "__main__":
+    bound = ContactForm()["email"]
+    context = Context({"csrf_token": "a" * 64})
+    print(f"{'fragment':<16} {'per call':>12} {'compiled':>12} {'speedup':>9}")
+    report(
+        "toggle_icons",
+        per_call(toggle_icons_per_call),
+        per_call(lambda: toggle_icons(icon1_name="sun", icon2_name="moon")),
+    )
+    report(
+        "hput", per_call(lambda: hput_per_call(bound)), per_call(lambda: hput(bound))
+    )
+    report(
+        "htmx_csrf",
+        per_call(lambda: htmx_csrf_per_call(context)),
+        per_call(lambda: htmx_csrf(context)),
+    )
@@ -0,0 +1,35 @@
+"""Cost of rendering a 60-field form with one `{% hput %}` per field versus a single
+`{% hform %}`."""
+from django import forms
+from django.template import Context, Template
+
+from . import per_call, report
+
+FIELDS = {
+    f"field_{i}": (
+        forms.CharField(help_text="Some help")
+        if i % 3
+        else forms.EmailField(required=False)
+    )
+    for i in range(58)
+} | {"next": forms.CharField(widget=forms.HiddenInput)}
+WideForm = type("WideForm", (forms.Form,), FIELDS)
+
+PER_FIELD = (
+    "{% load fragments %}"
+    "{% for field in form %}{% hput field validate='/validate' %}{% endfor %}"
+)
+SINGLE = "{% load fragments %}{% hform form validate='/validate' %}"
+
+
+if __name__ == "__main__":
+    per_field, single = Template(PER_FIELD), Template(SINGLE)
+    form = WideForm(data={"field_1": "x", "field_3": "not an email"})
+    form.is_valid()
+    context = Context({"form": form})
+    print(f"{'form':<16} {'hput':>12} {'hform':>12} {'speedup':>9}")
+    report(
+        f"{len(WideForm.base_fields)} fields",
+        per_call(lambda: per_field.render(context), number=20),
+        per_call(lambda: single.render(context), number=20),
+    )
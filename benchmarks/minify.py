@@ -0,0 +1,42 @@
+"""Cost of minifying large fragments with the previous two-pass regex of
+`strip_whitespace` (reproduced here) versus `minify()`."""
+import re
+
+from . import per_call, report
+
+ROW = """
+    <tr class="row  odd" data-id="{i}">
+        <td class=" name ">
+            <a href="/items/{i}/"  title="Item {i}">Item   {i}</a>
+        </td>
+        <td>
+            Some    description of
+            item {i}, with <em> emphasis </em> and a
+            <span class="badge">tag</span>
+        </td>
+    </tr>"""
+
+
+def legacy_strip_whitespace(value: str) -> str:
+    value = re.sub(r"\s{2,}|[\n]+", " ", str(value))
+    return re.sub(r'\s(?=[<>"])|(?<==\")\s|(?<=[<>])\s', "", str(value))
+
+
+def fragment(rows: int) -> str:
+    body = "".join(ROW.format(i=i) for i in range(rows))
+    return f"<table>\n  <tbody>{body}\n  </tbody>\n</table>"
+
+
+if __name__ == "__main__":
+    from django_fragments.templatetags.utils.minify import minify
+
+    print(f"{'fragment':<16} {'regex':>12} {'minify':>12} {'speedup':>9}")
+    for rows, indent in ((10, "    "), (100, "    "), (1000, "    "), (1000, "\t")):
+        html = fragment(rows).replace("    ", indent)
+        assert minify(html) == legacy_strip_whitespace(html)
+        number = max(10, 10000 // rows)
+        report(
+            f"{len(html) // 1000} KB{' tabs' if indent == chr(9) else ''}",
+            per_call(lambda: legacy_strip_whitespace(html), number=number),
+            per_call(lambda: minify(html), number=number),
+        )
@@ -0,0 +1,215 @@
+"""Per-call latency and peak memory of every tag and filter on realistic inputs,
+compared against a JSON baseline:
+
+    python -m benchmarks.suite --save     # record benchmarks/baseline.json
+    python -m benchmarks.suite            # compare, exit 1 on a regression
+    python -m benchmarks.suite -k md -t 0.5
+
+A case regresses when its time or peak memory exceeds the baseline's by more than the
+threshold (default: 0.25, i.e. 25%). Timings only compare on the same machine, so the
+baseline isn't committed: record it with this suite in a worktree of the base branch,
+see `docs/notes.md`. `DEBUG` is turned off so that the memoized fragments are measured
+as in production."""
+import argparse
+import inspect
+import json
+import sys
+import tempfile
+import tracemalloc
+from collections.abc import Callable
+from functools import partial
+from importlib import import_module
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.messages.storage.base import Message
+from django.template import Context, Template
+from django.test import RequestFactory
+
+from . import per_call
+from .hform import PER_FIELD, SINGLE, WideForm
+from .minify import ROW, fragment
+
+BASELINE = Path(__file__).with_name("baseline.json")
+MAX_RUN = 0.5  # seconds per timing run, at most, whatever a case's number of calls
+SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 20 20" fill="currentColor"'
+    ' class="w-5 h-5">\n  <path d="M{i} 5.22a.75.75 0 00-1.06 1.06L8.94 10z" />\n</svg>'
+)
+MARKDOWN = "\n\n".join(
+    f"## Section {i}\n\nSome *emphasis*, a [link](https://x.dev/{i}) and `code`."
+    f"\n\n- item {i}\n- item {i + 1}\n\n> quoted {i}\n\n```\nblock {i}\n```"
+    for i in range(200)
+)
+KWARGS = {f"{k}_{i}": "v" for k in ("aria", "hx", "data", "parent") for i in range(10)}
+
+
+def library(module: str):
+    """A module of the library, imported by the setup of a case rather than by the
+    suite, so that a case the version under test lacks fails alone, see `measure()`."""
+    return import_module(f"django_fragments.templatetags.{module}")
+
+
+def page(markup: str, context: Context) -> Callable:
+    return partial(Template(markup).render, context)
+
+
+def themer_uncached() -> None:
+    """`themer` without its memo, nor that of the `toggle_icons` it calls."""
+    fragments = library("fragments")
+    if cache_clear := getattr(fragments.toggle_icons, "cache_clear", None):
+        cache_clear()
+    inspect.unwrap(fragments.themer)()
+
+
+def cases(icon_dir: Path) -> dict[str, tuple[Callable[[], Callable], int]]:
+    """Each case's setup, which returns the function to time, and the number of calls
+    per timing run."""
+    for i in range(100):
+        (icon_dir / f"bench_{i}.html").write_text(SVG.format(i=i))
+    icons_ctx = Context({"names": range(100), "folder": icon_dir})
+    icons_page = (
+        "{% load fragments %}{% for i in names %}"
+        "{% icon name=i prefix='bench' folder=folder css='h-5 w-5' pre_text=i %}"
+        "{% endfor %}"
+    )
+    sprite_page = (
+        "{% load fragments %}{% for i in names %}"
+        "{% icon name=i prefix='bench' folder=folder sprite=True %}"
+        "{% endfor %}{% icon_sprite %}"
+    )
+    form = WideForm(data={"field_1": "x", "field_3": "not an email"})
+    form.is_valid()
+    form_ctx = Context({"form": form})
+    long_page = (
+        "{% load fragments %}{% whitespaceless %}<table>"
+        + "".join(ROW.format(i=i) for i in range(100))
+        + "{% for item in items %}\n  <tr><td>  {{ item }}  </td></tr>{% endfor %}"
+        + "\n</table>{% endwhitespaceless %}"
+    )
+    long_ctx = Context({"items": range(20)})
+    long_html = fragment(100)
+    request = RequestFactory().get("/")
+    messages = [Message(25, f"Saved {i % 5}") for i in range(50)]
+    stack_page = "{% load fragments %}{% messages_stack %}"
+    og_meta = ("Title", "Description", "https://x.dev/i.png", "Alt")
+    return {
+        "icon.100": (lambda: page(icons_page, icons_ctx), 20),
+        "icon.100.sprite": (lambda: page(sprite_page, icons_ctx), 20),
+        "themer": (lambda: library("fragments").themer, 1000),
+        "themer.uncached": (lambda: themer_uncached, 200),
+        "hput.59": (lambda: page(PER_FIELD, form_ctx), 10),
+        "hform.59": (lambda: page(SINGLE, form_ctx), 10),
+        "md.cached": (lambda: partial(library("fragments").md, MARKDOWN), 1000),
+        "md.uncached": (
+            lambda: partial(
+                library("utils").markdowns.pool.convert, MARKDOWN, ("attr_list",)
+            ),
+            3,
+        ),
+        "whitespaceless": (lambda: page(long_page, long_ctx), 100),
+        "strip_whitespace": (
+            lambda: partial(library("helpers").strip_whitespace, long_html),
+            100,
+        ),
+        "og_meta": (lambda: partial(library("og").og_meta, *og_meta), 2000),
+        "og_title": (lambda: partial(library("og").og_title, "Title", request), 2000),
+        "attrize": (lambda: partial(library("helpers").attrize, KWARGS), 2000),
+        "filter_attrs": (
+            lambda: partial(library("utils").filter_attrs, "hx", KWARGS),
+            2000,
+        ),
+        "messages_stack.50": (
+            lambda: page(stack_page, Context({"messages": messages})),
+            200,
+        ),
+    }
+
+
+def peak_kb(fn: Callable) -> float:
+    """Peak memory allocated during a single call, in KB."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def measure(selected: dict[str, tuple[Callable[[], Callable], int]]) -> dict[str, dict]:
+    """Time each case, skipping those whose setup or first call fails, e.g. with a tag
+    or function that the version of the library under test doesn't have. A case whose
+    calls are much slower in that version gets fewer of them per timing run."""
+    results = {}
+    for name, (setup, number) in selected.items():
+        try:
+            fn = setup()
+            fn()  # warm caches, pools and compiled templates
+        except Exception as e:
+            print(f"{name:<20} skipped: {type(e).__name__}: {e}")
+            continue
+        once = per_call(fn, number=1, repeat=1) / 1e6
+        number = max(1, min(number, int(MAX_RUN / once)))
+        results[name] = {"us": per_call(fn, number=number), "kb": peak_kb(fn)}
+        print(
+            f"{name:<20} {results[name]['us']:>12.1f}us {results[name]['kb']:>10.1f}KB"
+        )
+    return results
+
+
+def regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Cases whose time or memory exceeds the baseline's by more than `threshold`.
+
+    Examples:
+        >>> regressions({"a": {"us": 13, "kb": 1}}, {"a": {"us": 10, "kb": 1}}, 0.25)
+        ['a: us 10.0 -> 13.0 (+30%)']
+        >>> regressions({"a": {"us": 12, "kb": 1}, "b": {"us": 1, "kb": 1}}, {"a": {"us": 10, "kb": 1}}, 0.25)
+        []
+    """  # noqa: E501
+    failed = []
+    for name, result in results.items():
+        for metric in ("us", "kb"):
+            before, after = baseline.get(name, {}).get(metric), result[metric]
+            if before and after > before * (1 + threshold):
+                change = (after / before - 1) * 100
+                failed.append(
+                    f"{name}: {metric} {before:.1f} -> {after:.1f} (+{change:.0f}%)"
+                )
+    return failed
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--save", action="store_true", help="record the baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("-t", "--threshold", type=float, default=0.25)
+    parser.add_argument("-k", "--only", help="run the cases containing this text")
+    args = parser.parse_args(argv)
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, "testserver"]
+    with tempfile.TemporaryDirectory() as icon_dir:
+        selected = {
+            name: case
+            for name, case in cases(Path(icon_dir)).items()
+            if not args.only or args.only in name
+        }
+        results = measure(selected)
+    if args.save:
+        saved = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        args.baseline.write_text(json.dumps(saved | results, indent=2) + "\n")
+        print(f"Saved to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}, record one with --save")
+        return 0
+    if failed := regressions(
+        results, json.loads(args.baseline.read_text()), args.threshold
+    ):
+        print("Regressions:", *failed, sep="\n  ")
+        return 1
+    print(f"No regression beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
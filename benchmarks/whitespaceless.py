@@ -0,0 +1,34 @@
+"""Cost of `{% whitespaceless %}` over a large, mostly static template when its whole
+output is minified on each render (the previous implementation, reproduced here)
+versus when only the dynamic output is."""
+from django.template import Context, Template
+
+from django_fragments.templatetags.utils import minify
+
+from . import per_call, report
+from .minify import ROW
+
+SOURCE = (
+    "{% load fragments %}{% whitespaceless %}<table>"
+    + "".join(ROW.format(i=i) for i in range(100))
+    + "\n<tr><td class=' {{ css }} '>  {{ user }}  </td></tr>"
+    + "{% for item in items %}\n    <tr><td>  {{ item }}  </td></tr>{% endfor %}"
+    + "\n</table>{% endwhitespaceless %}"
+)
+
+
+def render_then_minify(template: Template, context: Context) -> str:
+    (node,) = [n for n in template.nodelist if hasattr(n, "pieces")]
+    return minify(node.nodelist.render(context).strip())
+
+
+if __name__ == "__main__":
+    template = Template(SOURCE)
+    context = Context({"css": "x", "user": "someone", "items": range(5)})
+    assert render_then_minify(template, context) == template.render(context)
+    print(f"{'template':<16} {'whole':>12} {'static':>12} {'speedup':>9}")
+    report(
+        f"{len(SOURCE) // 1000} KB",
+        per_call(lambda: render_then_minify(template, context), number=200),
+        per_call(lambda: template.render(context), number=200),
+    )
@@ -0,0 +1,7 @@
+"""Settings to serve the demo pages under load, see `benchmarks/asgi.py`: as in
+production, `DEBUG` is off and the debug toolbar left out of the middleware."""
+from .settings import *
+
+DEBUG = False
+ALLOWED_HOSTS = ["127.0.0.1", "localhost"]
+MIDDLEWARE = [m for m in MIDDLEWARE if not m.startswith("debug_toolbar.")]  # noqa: F405
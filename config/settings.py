@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 from pathlib import Path
 
+from debug_toolbar.settings import PANELS_DEFAULTS
 from django.forms.renderers import TemplatesSetting
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -51,6 +52,11 @@ MIDDLEWARE = [
     "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "django_fragments.middleware.HtmxMiddleware",
+]
+DEBUG_TOOLBAR_PANELS = [
+    *PANELS_DEFAULTS,
+    "django_fragments.panels.FragmentsPanel",
 ]
 INTERNAL_IPS = [
     # ...
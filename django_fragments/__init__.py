@@ -1 +1,8 @@
-from .utils import is_htmx, prep_nb
+def __getattr__(name: str):
+    # Importing `utils` loads the whole template library: only do so when these are
+    # used, not whenever Django imports the app.
+    if name in ("is_htmx", "prep_nb"):
+        from . import utils
+
+        return getattr(utils, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
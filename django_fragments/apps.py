@@ -1,6 +1,31 @@
-from django.apps import AppConfig
+from pathlib import Path
+
+from django.apps import AppConfig, apps
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
 
 
 class DjangoFragmentsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "django_fragments"
+
+    def ready(self):
+        """Warm the icon registry when `FRAGMENTS["icons_manifest"]` points to a file
+        built by `manage.py build_icon_manifest`, or, failing that, when
+        `FRAGMENTS["icons_preload"]` is set; forget the site names memoized by
+        `{% og_title %}` whenever a `Site` changes."""
+        from .templatetags.utils import icons
+
+        conf = getattr(settings, "FRAGMENTS", {})
+        if (manifest := conf.get("icons_manifest")) and Path(manifest).exists():
+            icons.load_manifest(manifest)
+        elif conf.get("icons_preload"):
+            icons.preload()
+
+        if apps.is_installed("django.contrib.sites"):
+            from django.contrib.sites.models import Site
+
+            from .templatetags.og import clear_site_names
+
+            post_save.connect(clear_site_names, sender=Site)
+            post_delete.connect(clear_site_names, sender=Site)
@@ -0,0 +1,79 @@
+from collections.abc import Callable
+
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.safestring import SafeText, mark_safe
+from jinja2 import Environment, nodes, pass_context
+from jinja2.ext import Extension
+
+from .templatetags import fragments, helpers, og
+from .templatetags.utils import minify
+
+
+def _with_context(fn: Callable) -> Callable:
+    """A tag that `takes_context`, as a global reading the same variables from the
+    Jinja2 context, e.g. `request`, `csrf_token` and `messages`."""
+
+    @pass_context
+    def wrapper(context, *args, **kwargs):
+        return fn(context, *args, **kwargs)
+
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
+
+
+FRAGMENT_GLOBALS: dict[str, Callable] = {
+    "icon": fragments.icon,
+    "toggle_icons": fragments.toggle_icons,
+    "themer": fragments.themer,
+    "nava": fragments.nava,
+    "curr": fragments.curr,
+    "navmenu": _with_context(fragments.navmenu),
+    "hput": fragments.hput,
+    "hform": fragments.hform,
+    "md_preview": fragments.md_preview,
+    "messages_stack": _with_context(fragments.messages_stack),
+    "fragments_js": fragments.fragments_js,
+    "og_title": og.og_title,
+    "og_desc": og.og_desc,
+    "og_img": og.og_img,
+    "og_meta": og.og_meta,
+    "htmx_csrf": _with_context(helpers.htmx_csrf),
+    "attrize": helpers.attrize,
+}
+FRAGMENT_FILTERS: dict[str, Callable] = {"md": fragments.md}
+
+
+class FragmentsExtension(Extension):
+    """Adds the fragments as globals, e.g. `{{ icon('x_mark_mini', css='h-5') }}` or
+    `{{ hput(form.email, validate=url) }}`, the `md` filter and a `whitespaceless` block:
+
+        {% whitespaceless %}<p class="  a  ">  Hello  </p>{% endwhitespaceless %}
+
+    Icons aren't referenced from a sprite sheet, which is kept in Django's render context.
+    """  # noqa: E501
+
+    tags = {"whitespaceless"}
+
+    def __init__(self, environment: Environment):
+        super().__init__(environment)
+        environment.globals.update(FRAGMENT_GLOBALS)
+        environment.filters.update(FRAGMENT_FILTERS)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        body = parser.parse_statements(("name:endwhitespaceless",), drop_needle=True)
+        call = self.call_method("_whitespaceless")
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _whitespaceless(self, caller) -> SafeText:
+        return mark_safe(minify(caller().strip()))
+
+
+def environment(**options) -> Environment:
+    """Jinja2 environment with `FragmentsExtension` and Django's `static` and `url`,
+    for the `environment` option of the Jinja2 backend."""
+    extensions = [*options.pop("extensions", []), FragmentsExtension]
+    env = Environment(extensions=extensions, **options)
+    env.globals.update(static=static, url=reverse)
+    return env
@@ -0,0 +1,46 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from django_fragments.templatetags.utils import scripts
+
+
+def default_output() -> Path:
+    """The first `STATICFILES_DIRS` folder without a prefix, where the static files
+    finders look and `collectstatic` collects from, else `STATIC_ROOT`. Not the app's
+    own static folder, which may be read-only once installed."""
+    for entry in settings.STATICFILES_DIRS:
+        if not isinstance(entry, (list, tuple)):
+            return Path(entry)
+    if settings.STATIC_ROOT:
+        return Path(settings.STATIC_ROOT)
+    raise CommandError(
+        "Nowhere to write the bundle: set STATICFILES_DIRS or STATIC_ROOT, or pass"
+        " --output."
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Minify the fragments' scripts into one content-hashed bundle with a gzipped"
+        " sibling, referenced by {% fragments_js %} once found by the static files"
+        " finders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            type=Path,
+            help=(
+                "Static folder to write fragments/<hash>.js into, defaults to the"
+                " first of STATICFILES_DIRS, else STATIC_ROOT."
+            ),
+        )
+
+    def handle(self, *args, output: Path | None, **options):
+        target = scripts.build(output or default_output())
+        size, gzipped = target.stat().st_size, Path(f"{target}.gz").stat().st_size
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote {target} ({size} bytes, {gzipped} gzipped)")
+        )
@@ -0,0 +1,35 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from django_fragments.templatetags.utils import IconRegistry
+
+
+class Command(BaseCommand):
+    help = (
+        "Render every <prefix>_*.html icon in FRAGMENTS['icons_path'] into a single"
+        " json manifest, loaded at startup when FRAGMENTS['icons_manifest'] is set."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            type=Path,
+            default=settings.FRAGMENTS.get("icons_manifest"),
+            help=(
+                "Where to write the manifest, defaults to FRAGMENTS['icons_manifest']."
+            ),
+        )
+        parser.add_argument("--prefix", help="Defaults to FRAGMENTS['icons_prefix'].")
+        parser.add_argument(
+            "--folder", type=Path, help="Defaults to FRAGMENTS['icons_path']."
+        )
+
+    def handle(self, *args, output: Path | None, prefix, folder, **options):
+        if not output:
+            raise CommandError(
+                "No --output given and FRAGMENTS['icons_manifest'] unset."
+            )
+        count = IconRegistry().dump_manifest(output, prefix=prefix, folder=folder)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} icons to {output}"))
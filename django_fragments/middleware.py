@@ -0,0 +1,90 @@
+from asgiref.sync import iscoroutinefunction
+from django.http.request import HttpRequest
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import cached_property
+
+from .templatetags.utils import collect, fragments_measured
+
+# A response to an htmx request can be a partial of the page at the same url, and a
+# history restore, though sent by htmx, gets the full page: both headers are in `Vary`.
+VARY_HEADERS = ("HX-Request", "HX-History-Restore-Request")
+
+
+class HtmxDetails:
+    """The htmx headers of a request, each read from `request.META` on first access.
+
+    It is truthy for a request made by htmx that expects a partial, i.e. any but a
+    history restore: on a cache miss of its history, htmx requests the url again and
+    swaps in the whole `<body>`, so that request is answered with the full page.
+    """
+
+    def __init__(self, request: HttpRequest):
+        self._meta = request.META
+
+    def __bool__(self) -> bool:
+        return self.request and not self.history_restore
+
+    def _get(self, name: str) -> str | None:
+        return self._meta.get(f"HTTP_HX_{name}") or None
+
+    @cached_property
+    def request(self) -> bool:
+        return self._get("REQUEST") == "true"
+
+    @cached_property
+    def boosted(self) -> bool:
+        return self._get("BOOSTED") == "true"
+
+    @cached_property
+    def history_restore(self) -> bool:
+        return self._get("HISTORY_RESTORE_REQUEST") == "true"
+
+    @cached_property
+    def target(self) -> str | None:
+        return self._get("TARGET")
+
+    @cached_property
+    def trigger(self) -> str | None:
+        return self._get("TRIGGER")
+
+    @cached_property
+    def trigger_name(self) -> str | None:
+        return self._get("TRIGGER_NAME")
+
+    @cached_property
+    def current_url(self) -> str | None:
+        return self._get("CURRENT_URL")
+
+
+class HtmxMiddleware(MiddlewareMixin):
+    """Sets `request.htmx`, see `HtmxDetails`, and adds the htmx request headers to
+    the `Vary` header of every response, so that a shared cache keeps the partial and
+    the full page at a url apart."""
+
+    def process_request(self, request: HttpRequest):
+        request.htmx = HtmxDetails(request)
+
+    def process_response(self, request: HttpRequest, response):
+        patch_vary_headers(response, VARY_HEADERS)
+        return response
+
+
+class FragmentStatsMiddleware(MiddlewareMixin):
+    """Collects, for each request, what the instrumented tags cost, see
+    `FragmentStats`, and sends it with the `fragments_measured` signal once the
+    response is rendered, e.g. for a receiver to forward to a metrics backend."""
+
+    def __call__(self, request: HttpRequest):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with collect() as stats:
+            response = self.get_response(request)
+        fragments_measured.send(sender=self.__class__, request=request, stats=stats)
+        return response
+
+    async def __acall__(self, request: HttpRequest):
+        with collect() as stats:
+            response = await self.get_response(request)
+        fragments_measured.send(sender=self.__class__, request=request, stats=stats)
+        return response
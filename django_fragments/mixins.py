@@ -0,0 +1,122 @@
+from collections.abc import Iterable
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.forms import BaseForm, BoundField, FileField
+from django.forms.utils import ErrorDict
+from django.http import HttpResponse
+from django.http.request import HttpRequest
+
+from .templatetags.fragments import hput
+from .utils import is_htmx
+
+
+def inline_field(form: BaseForm, request: HttpRequest) -> BoundField | None:
+    """The field whose `hput` wrapper, as set up by `hx_enable_inline_validation()`,
+    triggered the htmx request: its id is sent as the `HX-Trigger` header."""
+    trigger = request.headers.get("HX-Trigger", "")
+    if not trigger.startswith("hput_"):
+        return None
+    for bound in form:
+        if f"hput_{bound.id_for_label}" == trigger:
+            return bound
+    return None
+
+
+def clean_field(form: BaseForm, name: str) -> None:
+    """Run a single field's validation, i.e. the field's own `clean()` and the form's
+    `clean_<name>()`, as `form.full_clean()` would, recording errors on the form."""
+    bound, field = form[name], form.fields[name]
+    value = bound.initial if field.disabled else bound.data
+    try:
+        if isinstance(field, FileField):
+            value = field.clean(value, bound.initial)
+        else:
+            value = field.clean(value)
+        form.cleaned_data[name] = value
+        if hasattr(form, f"clean_{name}"):
+            form.cleaned_data[name] = getattr(form, f"clean_{name}")()
+    except ValidationError as e:
+        form.add_error(name, e)
+
+
+def validate_field(
+    form: BaseForm, name: str, dependencies: Iterable[str] = ()
+) -> BoundField:
+    """Validate only the field `name` of a bound `form`, instead of the whole form.
+
+    If the field takes part in cross-field rules, name the fields it depends on as
+    `dependencies`: these are cleaned as well and then `form.clean()` is run, but only
+    the errors it adds to `name` are kept.
+
+    Returns:
+        BoundField: The field, with its errors
+    """
+    form._errors = ErrorDict()
+    form.cleaned_data = {}
+    clean_field(form, name)
+    if dependencies:
+        for other in dependencies:
+            clean_field(form, other)
+        try:
+            form.clean()
+        except ValidationError:
+            pass  # only errors on `name` are of interest
+        form._errors = ErrorDict(
+            {name: form._errors[name]} if name in form._errors else {}
+        )
+    return form[name]
+
+
+class InlineValidationMixin:
+    """For a `FormView` whose fields are rendered with `{% hput field validate=url %}`,
+    where `url` is that of the view itself: an htmx post triggered by a field's blur
+    validates only that field and responds with only its `hput` fragment, rather than
+    running `form.is_valid()` and rendering the whole template.
+
+    Any other post, e.g. the actual submission, is handled as usual.
+
+    Attributes:
+        inline_dependencies (dict[str, Iterable[str]]): For fields with cross-field rules in `form.clean()`, the other fields they depend on.
+        hput_kls (str | None): The `kls` the fields are rendered with.
+        hput_label_kls (str | None): The `label_kls` the fields are rendered with.
+    """  # noqa: E501
+
+    inline_dependencies: dict[str, Iterable[str]] = {}
+    hput_kls: str | None = "h"
+    hput_label_kls: str | None = None
+
+    def post(self, request: HttpRequest, *args, **kwargs):
+        if is_htmx(request):
+            form = self.get_form()
+            if bound := inline_field(form, request):
+                return self.inline_response(form, bound)
+        return super().post(request, *args, **kwargs)
+
+    def inline_response(self, form: BaseForm, bound: BoundField) -> HttpResponse:
+        deps = self.inline_dependencies.get(bound.name, ())
+        bound = validate_field(form, bound.name, deps)
+        return HttpResponse(
+            hput(
+                bound,
+                kls=self.hput_kls,
+                label_kls=self.hput_label_kls,
+                validate=self.request.get_full_path(),
+            )
+        )
+
+
+class AsyncInlineValidationMixin(InlineValidationMixin):
+    """`InlineValidationMixin` for an async `FormView`: its handlers are coroutines, so
+    that under ASGI the view is dispatched on the event loop, each running the usual
+    handler, which builds, validates and saves the form, e.g. a `ModelForm` in
+    `form_valid()`, in a thread where the ORM can be used."""
+
+    async def get(self, request: HttpRequest, *args, **kwargs):
+        return await sync_to_async(super().get)(request, *args, **kwargs)
+
+    async def post(self, request: HttpRequest, *args, **kwargs):
+        return await sync_to_async(super().post)(request, *args, **kwargs)
+
+    async def put(self, request: HttpRequest, *args, **kwargs):
+        return await self.post(request, *args, **kwargs)
@@ -0,0 +1,24 @@
+from debug_toolbar.panels import Panel
+from django.utils.translation import gettext_lazy as _
+
+from .templatetags.utils import collect
+
+
+class FragmentsPanel(Panel):
+    """A django-debug-toolbar panel with what each instrumented tag of the request
+    cost: calls, total and p95 time, bytes output and cache hit rate, and the hit
+    rate of each cache over the request. Add
+    `"django_fragments.panels.FragmentsPanel"` to `DEBUG_TOOLBAR_PANELS`."""
+
+    title = _("Fragments")
+    template = "debug_toolbar/panels/fragments.html"
+
+    def nav_subtitle(self):
+        tags = self.get_stats().get("tags") or {}
+        return _("%d calls") % sum(row["calls"] for row in tags.values())
+
+    def process_request(self, request):
+        with collect() as stats:
+            response = super().process_request(request)
+        self.record_stats({"tags": stats.summary(), "caches": stats.cache_summary()})
+        return response
@@ -1,31 +1,98 @@
+import functools
 from pathlib import Path
 
 from django import template
 from django.conf import settings
-from django.forms import BoundField
+from django.forms import BaseForm, BaseFormSet, BoundField
 from django.http.request import HttpRequest
 from django.template import Context, Template
-from django.template.loader import render_to_string
-from django.urls import reverse
-from django.utils.html import format_html
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
 from django.utils.safestring import SafeText, mark_safe
-from markdown import markdown
-
-from .utils import filter_attrs, wrap_svg
+from django.utils.translation import gettext as _
+
+from .utils import (
+    SpriteSheet,
+    escape_text,
+    filter_attrs,
+    icons,
+    instrumented,
+    markdowns,
+    memoize_fragment,
+    minify,
+    preview_html,
+    render_blocks,
+    render_errors,
+    render_widget,
+    scripts,
+    urls,
+    wrap_svg,
+)
 
 register = template.Library()
 
+TOGGLE_ICONS_HTML = """
+    {% load fragments %}
+    {% whitespaceless %}
+    <button onclick=toggleTheme() type="button" class="{{ btn_kls }}" aria-label="{{aria_label}}">
+        {{ icon1 }}
+        {{ icon2 }}
+    </button>
+    {% endwhitespaceless %}
+    """  # noqa: E501
+
+# Minified here, once: on each call, only the values formatted in need it.
+FIELD_HTML = minify("""
+    <div {attrs} {hidden} {invalid} class="{kls}" data-widget="{widget_type}">
+        <label for="{id_for_label}" {label_class}>{label}</label>
+        {widget}
+        <small>{help_text}</small>
+        {errors}
+    </div>
+    """).strip()
+
+
+@functools.cache
+def compiled(markup: str) -> Template:
+    """Compile the `markup` of a fragment on first use only. This can't happen on import
+    since the markup itself loads this library."""
+    return Template(markup)
+
 
 @register.filter
+@instrumented("md")
 def md(text: str, exts: list[str] = ["attr_list"]) -> SafeText:
-    """Convert a text in markdown to its html equivalent using specific extensions."""
-    return mark_safe(markdown(text, extensions=exts))
+    """Convert a text in markdown to its html equivalent using specific extensions.
+
+    Engines are pooled and the output cached by content hash, see `MarkdownRenderer`."""
+    return mark_safe(markdowns.render(text, exts))
+
+
+@register.simple_tag
+@instrumented("md_preview")
+def md_preview(
+    text: str, target: str = "md-preview", exts: str = "attr_list"
+) -> SafeText:
+    """Convert a text in markdown block by block, each in its own `<div>`, so that a live
+    preview can afterwards be updated with only the blocks that changed, see
+    `django_fragments.utils.md_preview()`.
+
+    Args:
+        text (str): The markdown to convert
+        target (str, optional): The id of the preview element. Defaults to "md-preview".
+        exts (str, optional): Comma-separated extensions. Defaults to "attr_list".
+
+    Returns:
+        SafeText: A `<div id="{target}">` wrapping each rendered block
+    """  # noqa: E501
+    return mark_safe(preview_html(render_blocks(text, exts), target))
 
 
 @register.simple_tag
 def curr(lhs: str, reversible: str) -> SafeText:
     """Returns a string `aria-current` for use as an attribute when `lhs` path matches the
-    `reversible` value that will be passed to the `django.urls.reverse()`.
+    `reversible` value that will be passed to the `django.urls.reverse()`, memoized by
+    `ReverseCache`.
 
     Args:
         lhs (str): lhs stands for lefthand side, should be first positional element in the tag
@@ -34,10 +101,11 @@ def curr(lhs: str, reversible: str) -> SafeText:
     Returns:
         SafeText: The text "aria-current=page" if a match occurs, otherwise ""
     """  # noqa: E501
-    return mark_safe("aria-current=page" if lhs == reverse(reversible) else "")
+    return mark_safe("aria-current=page" if lhs == urls.reverse(reversible) else "")
 
 
 @register.simple_tag
+@instrumented("nava")
 def nava(
     reversible: str,
     text: str | None = None,
@@ -59,43 +127,193 @@ def nava(
     Returns:
         SafeText: The output anchor tag
     """  # noqa: E501
+    url = urls.reverse(reversible)
     return format_html(
         "<a {aria} href='{url}' class='{css}'>{text}</a>",
         text=text or "",
-        url=reverse(reversible),
+        url=url,
         css=css,
-        aria=curr(request.path, reversible) if request else "",
+        aria=mark_safe("aria-current=page" if request and request.path == url else ""),
     )
 
 
-@register.simple_tag
+@register.simple_tag(takes_context=True)
+@instrumented("navmenu")
+def navmenu(context, *items: str | tuple[str, str], css: str | None = None) -> SafeText:
+    """HTML fragment: an `<li><a>` for each of the `items`, the one matching the current
+    path, if a `request` is in the context, marked with `aria-current=page`.
+
+    Each item is an argument-less url name and its label, either as a pair or joined by
+    `|`, e.g. `"blog:index|Blog"`; without a label, the name is used. The urls come from
+    `ReverseCache` and `request.path` is read once for the whole menu.
+
+    Args:
+        *items (str | tuple[str, str]): The url names and labels, in menu order
+        css (str | None, optional): If provided, will populate the `class` attribute of each anchor element. Defaults to None.
+
+    Returns:
+        SafeText: The `<li>` elements, to be placed inside a `<ul>` or `<ol>`
+    """  # noqa: E501
+    request = context.get("request")
+    path = request.path if request else None
+    attrs = format_html(" class='{}'", css) if css else ""
+    links = []
+    for item in items:
+        if isinstance(item, str):
+            name, _sep, label = item.partition("|")
+        else:
+            name, label = item
+        url = urls.reverse(name)
+        aria = mark_safe(" aria-current=page" if url == path else "")
+        links.append((url, attrs, aria, label or name))
+    return format_html_join("", "<li><a href='{}'{}{}>{}</a></li>", links)
+
+
 def icon(
     name: str,
-    prefix: str = settings.FRAGMENTS.get("icons_prefix"),
-    folder: Path = settings.FRAGMENTS.get("icons_path"),
+    prefix: str | None = None,
+    folder: Path | None = None,
     css: str | None = None,
+    sheet: SpriteSheet | None = None,
     **kwargs,
 ) -> SafeText:
     """Make an `<svg>` fragment, using a file found within the `name` + `prefix` + `folder` path, and add the appropriate
     css classes and attributes, optionally including parent/sibling tags when parameters dictate.
 
+    The file is read and normalized once per process, see `IconRegistry`; subsequent calls only splice in the decorations.
+
     Args:
         name (str): The prefixless (prefix_) name of the `html` file containing an `<svg>` icon, presumes to be formatted and included in the proper folder previously.
         css (str, optional): Previously defined CSS to add to the `<svg>` icon. Defaults to None.
-        prefix (str, optional): Source of the svg file; needs to be declared in `settings.py`.
-        folder (str, optional): Where to find the template; needs to be declared in `settings.py`.
+        prefix (str, optional): Source of the svg file. Defaults to `FRAGMENTS["icons_prefix"]`.
+        folder (str, optional): Where to find the template. Defaults to `FRAGMENTS["icons_path"]`.
+        sheet (SpriteSheet, optional): If supplied, the `<svg>` only contains a `<use href="#<prefix>-<name>">` and the icon is recorded in the sheet. Defaults to None.
         **kwargs (dict): The following kwargs: `pre_`, `post_`, and `parent_` args are respected by `start_html_tag_helpers`
 
     Returns:
         SafeText: Small HTML fragment visually representing an svg icon but which may contain related tags.
     """  # noqa: E501
-    path = folder / f"{prefix}_{name}.html"
-    html = render_to_string(str(path))
-    svg_with_kwargs = wrap_svg(html_markup=html, css=css, **kwargs)
-    return mark_safe(str(svg_with_kwargs).strip())
+    if prefix is None:
+        prefix = settings.FRAGMENTS.get("icons_prefix")
+    if folder is None:
+        folder = settings.FRAGMENTS.get("icons_path")
+    entry = icons.get(name=name, prefix=prefix, folder=folder)
+    use = sheet.use(f"{prefix}-{name}", entry.svg) if sheet else None
+    return mark_safe(
+        wrap_svg(html_markup=entry.svg, css=css, use=use, **kwargs).strip()
+    )
+
+
+@register.simple_tag(takes_context=True, name="icon")
+@instrumented("icon")
+def icon_tag(context, name: str, sprite: bool | None = None, **kwargs) -> SafeText:
+    """The `{% icon %}` tag, see `icon()`. In sprite mode, i.e. `sprite=True` or
+    `FRAGMENTS["icons_sprite"]`, the icon becomes a `<use>` reference to a `<symbol>`
+    that `{% icon_sprite %}` emits once for the whole render.
+
+    Args:
+        name (str): The prefixless (prefix_) name of the `html` file containing an `<svg>` icon.
+        sprite (bool | None, optional): Whether to reference the icon from the sprite sheet. Defaults to `FRAGMENTS["icons_sprite"]`, itself False if unset.
+        **kwargs (dict): Passed to `icon()`
+
+    Returns:
+        SafeText: Small HTML fragment visually representing an svg icon but which may contain related tags.
+    """  # noqa: E501
+    if sprite is None:
+        sprite = settings.FRAGMENTS.get("icons_sprite", False)
+    sheet = SpriteSheet.from_context(context) if sprite else None
+    return icon(name, sheet=sheet, **kwargs)
+
+
+@register.simple_tag(takes_context=True)
+def icon_sprite(context) -> SafeText:
+    """Emit a hidden `<svg>` with a `<symbol>` for each icon referenced in sprite mode
+    so far, skipping those emitted by an earlier `{% icon_sprite %}` in the same render.
+    Place it after the icons, e.g. at the end of `<body>`.
+
+    Returns:
+        SafeText: The sprite sheet or an empty string if no new icons were referenced.
+    """
+    return mark_safe(SpriteSheet.from_context(context).render())
+
+
+@register.simple_tag
+@instrumented("fragments_js")
+def fragments_js() -> SafeText:
+    """Emit a deferred `<script>` for the bundle of the fragments' scripts built with
+    `manage.py build_fragments_js`, or one per script if it isn't built. Deferred, they
+    don't block the first paint and run before `DOMContentLoaded`, when hyperscript
+    calls `doSelect()` and `doMenu()`. `doTheme.js` is loaded separately, see
+    `themeHTML()`.
+
+    Returns:
+        SafeText: One or more `<script defer>` tags.
+    """
+    return format_html_join(
+        "",
+        '<script defer src="{}"></script>',
+        ((static(n),) for n in scripts.reference()),
+    )
+
+
+MESSAGE_HTML = (
+    '<div id="msg-{0}" class="{1}" data-level="{2}" _="on load show me">{3}{4}'
+    '<button id="msg-close-{0}" type="button" _="on click remove #msg-{0} end">'
+    "{5}</button></div>"
+)
+CLOSE_ICON = {
+    "name": "x_mark_mini",
+    "css": "h-5 w-5",
+    "pre_text": "Close",
+    "pre_class": "sr-only",
+    "aria_hidden": "true",
+}
+
+
+@register.simple_tag(takes_context=True)
+@instrumented("messages_stack")
+def messages_stack(context, limit: int | None = None, **kwargs) -> SafeText:
+    """HTML fragment: a dismissable `<div>` for each of the `messages` in the context,
+    all sharing one close icon, decorated once per render rather than once per message.
+
+    Messages with the same level and text, e.g. from repeated submissions, are shown
+    once, followed by `<small>×n</small>`. Only the first `limit` are shown; the rest are
+    still marked as read.
+
+    Args:
+        limit (int | None, optional): Maximum number of messages shown. Defaults to `FRAGMENTS["messages_limit"]`, itself 10 if unset.
+        **kwargs (dict): Passed to `{% icon %}` for the close icon, in place of the defaults of `CLOSE_ICON`, e.g. `sprite=True`
+
+    Returns:
+        SafeText: The message `<div>` elements
+    """  # noqa: E501
+    if limit is None:
+        limit = settings.FRAGMENTS.get("messages_limit", 10)
+    stack: dict[tuple, list] = {}
+    for message in context.get("messages") or ():
+        if (key := (message.level, str(message))) in stack:
+            stack[key][1] += 1
+        else:
+            stack[key] = [message, 1]
+    if not stack:
+        return mark_safe("")
+    close = icon_tag(context, **(CLOSE_ICON | kwargs))
+    rows = (
+        (
+            idx,
+            message.tags,
+            message.level_tag.lower(),
+            message,
+            format_html("<small>×{}</small>", count) if count > 1 else "",
+            close,
+        )
+        for idx, (message, count) in enumerate(list(stack.values())[:limit], 1)
+    )
+    return format_html_join("", MESSAGE_HTML, rows)
 
 
 @register.simple_tag
+@memoize_fragment("themer_cache_size")
 def toggle_icons(
     btn_kls: str | None = "theme-toggler",
     aria_label: str | None = "Toggle mode",
@@ -112,15 +330,7 @@ def toggle_icons(
         SafeText: HTML fragment button
     """
     return mark_safe(
-        Template("""
-            {% load fragments %}
-            {% whitespaceless %}
-            <button onclick=toggleTheme() type="button" class="{{ btn_kls }}" aria-label="{{aria_label}}">
-                {{ icon1 }}
-                {{ icon2 }}
-            </button>
-            {% endwhitespaceless %}
-            """)  # noqa: E501
+        compiled(TOGGLE_ICONS_HTML)
         .render(
             context=Context(
                 {
@@ -136,6 +346,8 @@ def toggle_icons(
 
 
 @register.simple_tag
+@instrumented("themer")
+@memoize_fragment("themer_cache_size")
 def themer(
     btn_kls: str | None = "theme-toggler",
     aria_label: str | None = "Toggle dark mode",
@@ -171,6 +383,9 @@ def themer(
 
     This implies that the svgs for `sun` and `moon` are present in the designated template folder.
 
+    Since the output only depends on the arguments and the icons, it is cached per distinct set of arguments,
+    see `FRAGMENTS["themer_cache_size"]` (default: 32) and `memoize_fragment()`.
+
     Args:
         btn_kls (str | None, optional): Will populate the button's `class` attribute.. Defaults to "theme-toggler".
         aria_label (str | None, optional): Will populate the button's `aria-label` attribute. Defaults to "Toggle mode".
@@ -210,6 +425,7 @@ def themer(
 
 
 @register.simple_tag
+@instrumented("hput")
 def hput(
     bound: BoundField,
     kls: str | None = "h",
@@ -234,35 +450,84 @@ def hput(
         raise Exception(f"Improper field {bound=}")
 
     attrs = hx_enable_inline_validation(bound, validate) if validate else ""
-    return mark_safe(
-        Template("""
-            {% load fragments %}
-            {% whitespaceless %}
-            <div {{attrs}}
-                {% if bound.is_hidden %}hidden{% endif %}
-                {% if bound.errors %}data-invalid=true{% endif %}
-                class="{{ kls }}"
-                data-widget="{{ bound.widget_type }}"
-            >
-                <label for="{{ bound.id_for_label }}"
-                    {% if label_kls %}class="{{ label_kls }}"{% endif %}>
-                    {{bound.label}}
-                </label>
-                {{ bound }}
-                <small>{{ bound.help_text }}</small>
-                {{ bound.errors }}
-            </div>
-            {% endwhitespaceless %}
-            """)  # noqa: E501
-        .render(
-            context=Context(
-                {
-                    "bound": bound,
-                    "label_kls": label_kls,
-                    "kls": kls,
-                    "attrs": attrs,
-                },
+    return mark_safe(minify(_field(bound, attrs, kls, label_kls)).strip())
+
+
+def _field(bound: BoundField, attrs: str, kls: str | None, label_kls: str | None):
+    """`FIELD_HTML` of a visible or hidden field, not yet minified."""
+    esc = escape_text
+    return FIELD_HTML.format(
+        attrs=attrs,
+        hidden="hidden" if bound.is_hidden else "",
+        invalid="data-invalid=true" if bound.errors else "",
+        kls=esc(kls),
+        widget_type=esc(bound.widget_type),
+        id_for_label=esc(bound.id_for_label),
+        label_class=f'class="{esc(label_kls)}"' if label_kls else "",
+        label=esc(bound.label),
+        widget=render_widget(bound),
+        help_text=esc(bound.help_text),
+        errors=render_errors(bound.errors),
+    )
+
+
+def _form_fields(
+    form: BaseForm, kls: str | None, label_kls: str | None, validate: str | None
+) -> list[str]:
+    """A form's errors, including those of its hidden fields, then its visible fields
+    as by `hput` and its hidden fields as is."""
+    from .helpers import hx_enable_inline_validation
+
+    errors = form.non_field_errors().copy()
+    fields, hidden = [], []
+    for bound in form:
+        if bound.is_hidden:
+            hidden.append(render_widget(bound))
+            errors.extend(
+                _("(Hidden field %(name)s) %(error)s")
+                % {"name": bound.name, "error": str(e)}
+                for e in bound.errors
             )
+        else:
+            attrs = hx_enable_inline_validation(bound, validate) if validate else ""
+            fields.append(_field(bound, attrs, kls, label_kls))
+    return [render_errors(errors), *fields, *hidden]
+
+
+@register.simple_tag
+@instrumented("hform")
+def hform(
+    form: BaseForm | BaseFormSet,
+    kls: str | None = "h",
+    label_kls: str | None = None,
+    validate: str | None = None,
+) -> SafeText:
+    """Every field of a form, or of each form of a formset, wrapped as by `hput`, then
+    minified in a single pass. Hidden fields are output as is, after the visible ones,
+    and their errors listed with the non-field errors at the top.
+
+    Args:
+        form (BaseForm | BaseFormSet): The form or formset to render, without the `<form>` element
+        kls (str | None, optional): If supplied will supply each field's containing div's class attribute. Defaults to "h".
+        label_kls (str | None, optional): If supplied will supply each label's class attribute. Defaults to None.
+        validate (str | None, optional): A url for inline field validation, see `hput`. Defaults to None.
+
+    Returns:
+        SafeText: The html fragment consisting of the wrapped fields
+    """  # noqa: E501
+    if isinstance(form, BaseFormSet):
+        forms, errors, management = (
+            form.forms,
+            form.non_form_errors(),
+            form.management_form,
         )
-        .strip()
-    )
+    elif isinstance(form, BaseForm):
+        forms, errors, management = [form], None, ""
+    else:
+        raise Exception(f"Improper form {form=}")
+
+    html = [render_errors(errors) if errors else ""]
+    for f in forms:
+        html += _form_fields(f, kls, label_kls, validate)
+    html.append(escape_text(management))
+    return mark_safe("".join(minify(piece).strip() for piece in html))
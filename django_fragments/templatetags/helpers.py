@@ -1,22 +1,32 @@
-import re
+from collections.abc import Iterator
 
 from django import template
+from django.conf import settings
 from django.forms import BoundField
-from django.template import Context, Template
+from django.template import Template
+from django.template.loader_tags import IncludeNode, construct_relative_path
 from django.utils.functional import keep_lazy_text
+from django.utils.html import format_html
 from django.utils.safestring import SafeText, mark_safe
 
 from .fragments import register
+from .utils import (
+    Minifier,
+    SpriteSheet,
+    StaticText,
+    fragment_caches,
+    instrumented,
+    minify,
+)
+from .utils.fragment_cache import fingerprint
 
 
 @register.simple_tag(takes_context=True)
 def htmx_csrf(context) -> SafeText:
     """Just a tiny fragment to signify htmx-compatible requests
     that will include the csrf_token."""
-    return mark_safe(
-        Template("""hx-headers='{"X-CSRFToken": "{{ csrf_token }}"}'""").render(
-            context=Context(context)
-        )
+    return format_html(
+        """hx-headers='{{"X-CSRFToken": "{}"}}'""", context.get("csrf_token", "")
     )
 
 
@@ -62,32 +72,36 @@ def hx_enable_inline_validation(bound: BoundField, url: str) -> str:
 
 @keep_lazy_text
 def strip_whitespace(value):
-    """
-    See https://stackoverflow.com/a/72942459 answer by [Will Gordon](https://stackoverflow.com/users/6758654/will-gordon)
-    Return the given HTML with any newlines, duplicate whitespace, or trailing spaces are removed.
+    """Return the given HTML with any newlines, duplicate whitespace, or trailing spaces
+    removed, see `minify()`. The contents of `<pre>`, `<textarea>`, `<script>` and
+    `<style>` elements are left untouched.
+
+    Originally two regex passes from https://stackoverflow.com/a/72942459 answer by [Will Gordon](https://stackoverflow.com/users/6758654/will-gordon), whose output is
+    otherwise unchanged.
     """  # noqa: E501
-    # Process duplicate whitespace occurrences or
-    # *any* newline occurrences and reduce to a single space
-    value = re.sub(r"\s{2,}|[\n]+", " ", str(value))
-    # After processing all of the above,
-    # any trailing spaces should also be removed
-    # Trailing space examples:
-    #   - <div >                    Matched by: \s(?=[<>"])
-    #   - < div>                    Matched by: (?<=[<>])\s
-    #   - <div class="block ">      Matched by: \s(?=[<>"])
-    #   - <div class=" block">      Matched by: (?<==\")\s
-    #   - <span> text               Matched by: (?<=[<>])\s
-    #   - text </span>              Matched by: \s(?=[<>"])
-    value = re.sub(r'\s(?=[<>"])|(?<==\")\s|(?<=[<>])\s', "", str(value))
-    return value
+    return minify(str(value))
 
 
 class WhitespacelessNode(template.Node):
+    """Static text is minified once, when the template is compiled; on each render, only
+    the output of the other nodes and the whitespace at their seams is, see `Minifier`.
+    """  # noqa: E501
+
     def __init__(self, nodelist):
         self.nodelist = nodelist
+        self.pieces = [
+            StaticText(node.s) if isinstance(node, template.base.TextNode) else node
+            for node in nodelist
+        ]
 
+    @instrumented("whitespaceless")
     def render(self, context):
-        return strip_whitespace(self.nodelist.render(context).strip())
+        minifier = Minifier()
+        for piece in self.pieces:
+            if not isinstance(piece, StaticText):
+                piece = str(piece.render_annotated(context))
+            minifier.feed(piece)
+        return mark_safe(minifier.close())
 
 
 @register.tag
@@ -96,3 +110,134 @@ def whitespaceless(parser, token):
     nodelist = parser.parse(("endwhitespaceless",))
     parser.delete_first_token()
     return WhitespacelessNode(nodelist)
+
+
+class FragmentNode(template.Node):
+    """A named part of a template, output in place like any other node, that can also
+    be rendered on its own, see `FragmentTemplateResponse`."""
+
+    def __init__(self, name: str, nodelist):
+        self.name = name
+        self.nodelist = nodelist
+
+    def render(self, context):
+        return self.nodelist.render(context)
+
+
+@register.tag
+def fragment(parser, token):
+    """Name the enclosed part of a template, e.g. `{% fragment "contact_form" %}`, so that a `FragmentTemplateResponse` can render only that part for htmx requests."""  # noqa: E501
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes one argument: a name")
+    name = bits[1].strip("\"'")
+    names = parser.__dict__.setdefault("_fragment_names", set())
+    if name in names:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' named {name!r} appears twice")
+    names.add(name)
+    nodelist = parser.parse(("endfragment",))
+    parser.delete_first_token()
+    return FragmentNode(name, nodelist)
+
+
+def _included(nodelist, context, seen: set | None = None) -> Iterator[Template]:
+    """The templates that the `{% include %}` tags of `nodelist` render in `context`,
+    and those they include in turn, resolved as `IncludeNode.render()` does."""
+    seen = set() if seen is None else seen
+    for node in nodelist.get_nodes_by_type(IncludeNode):
+        tmpl = node.template.resolve(context)
+        if not callable(getattr(tmpl, "render", None)):
+            names = (tmpl,) if isinstance(tmpl, str) else tuple(tmpl or ())
+            try:
+                if origin := node.origin.template_name:
+                    names = tuple(construct_relative_path(origin, n) for n in names)
+                tmpl = context.template.engine.select_template(names)
+            except (template.TemplateDoesNotExist, template.TemplateSyntaxError):
+                continue  # left for the include itself to raise
+        tmpl = getattr(tmpl, "template", tmpl)
+        if id(tmpl) not in seen:
+            seen.add(id(tmpl))
+            yield tmpl
+            yield from _included(tmpl.nodelist, context, seen)
+
+
+def _digest(tmpl: Template) -> str:
+    """Fingerprint of a template's source, kept on the template, which the cached
+    loader replaces when its file changes."""
+    if (digest := getattr(tmpl, "_fragment_digest", None)) is None:
+        digest = tmpl._fragment_digest = fingerprint(str(tmpl.origin), tmpl.source)
+    return digest
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, name, fingerprint, timeout, vary_on, options):
+        self.nodelist = nodelist
+        self.name = name
+        self.fingerprint = fingerprint
+        self.timeout = timeout
+        self.vary_on = vary_on
+        self.options = options
+
+    @instrumented("fragment_cache")
+    def render(self, context):
+        try:
+            timeout = self.timeout.resolve(context)
+            timeout = None if timeout is None else float(timeout)
+        except (ValueError, TypeError):
+            raise template.TemplateSyntaxError(
+                f"'fragment_cache' timeout must be a number, not {timeout!r}"
+            )
+        opts = {k: v.resolve(context) for k, v in self.options.items()}
+        key = fragment_caches.key(
+            self.name,
+            fingerprint(
+                self.fingerprint, *map(_digest, _included(self.nodelist, context))
+            ),
+            [var.resolve(context) for var in self.vary_on],
+            context.get("request"),
+        )
+        sheet = SpriteSheet.from_context(context)
+
+        def render() -> tuple[str, dict]:
+            with sheet.recording() as symbols:
+                return self.nodelist.render(context), symbols
+
+        html, symbols = fragment_caches.get_or_render(
+            key,
+            render,
+            timeout=timeout,
+            stale=float(
+                opts.get("stale", settings.FRAGMENTS.get("fragment_cache_stale", 30))
+            ),
+            using=opts.get("using"),
+        )
+        for id, svg in symbols.items():  # for `{% icon_sprite %}`, also on a hit
+            sheet.use(id, svg)
+        return html
+
+
+@register.tag
+def fragment_cache(parser, token):
+    """Cache the enclosed part of a template, like `{% cache %}`, keyed on its name, the values it varies on, whether the request is made by htmx and what it targets, and the template source between the tags, including that of the templates it `{% include %}`s, e.g. `{% fragment_cache 300 "nav" request.path stale=60 using="default" %}`. See `FragmentCache`."""  # noqa: E501
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' takes at least two arguments: a timeout and a name"
+        )
+    timeout, name = parser.compile_filter(bits[1]), bits[2].strip("\"'")
+    vary_on, options = [], {}
+    for bit in bits[3:]:
+        key, _, value = bit.partition("=")
+        if key in ("stale", "using") and value:
+            options[key] = parser.compile_filter(value)
+        else:
+            vary_on.append(parser.compile_filter(bit))
+    pending = parser.tokens[:]
+    nodelist = parser.parse(("endfragment_cache",))
+    consumed = reversed(pending[len(parser.tokens) :])
+    source = "".join(f"{t.token_type.value}{t.contents}" for t in consumed)
+    parser.delete_first_token()
+    origin = getattr(parser.origin, "name", "")
+    return FragmentCacheNode(
+        nodelist, name, fingerprint(str(origin), source), timeout, vary_on, options
+    )
@@ -1,50 +1,103 @@
+from django.apps import apps
+from django.conf import settings
 from django.contrib.sites.shortcuts import get_current_site
 from django.http.request import HttpRequest
 from django.utils.html import format_html
+from django.utils.safestring import SafeText
 
 from .fragments import register
 from .helpers import strip_whitespace
+from .utils import instrumented
+
+OG_TITLE_HTML = strip_whitespace("""
+    <title>{title}</title>
+    <meta property="og:title" content="{title}"/>
+    <meta name="twitter:title" content="{title}"/>
+    """)
+OG_DESC_HTML = strip_whitespace("""
+    <meta name="description" content="{desc}"/>
+    <meta property="og:description" content="{desc}"/>
+    <meta name="twitter:description" content="{desc}"/>
+    """)
+OG_IMG_HTML = strip_whitespace("""
+    <meta property="og:image" content="{url}"/>
+    <meta property="og:image:alt" content="{img_alt}"/>
+    <meta name="twitter:image" content="{url}"/>
+    <meta name="twitter:image:alt" content="{img_alt}"/>
+    """)
+
+_site_names: dict = {}
+
+
+def site_name(request: HttpRequest) -> str | None:
+    """Name of the current site, memoized per `SITE_ID`, or per host when `SITE_ID` is
+    unset. Entries are dropped whenever a `Site` is saved or deleted, see `apps.py`.
+    Without `django.contrib.sites`, the name is the request's host."""
+    if not apps.is_installed("django.contrib.sites"):
+        return get_current_site(request).name
+    key = getattr(settings, "SITE_ID", None) or request.get_host()
+    if key not in _site_names:
+        _site_names[key] = get_current_site(request).name
+    return _site_names[key]
+
+
+def clear_site_names(**kwargs):
+    _site_names.clear()
+
+
+def titled(text: str, request: HttpRequest | None) -> str:
+    if request and (name := site_name(request)):
+        if name not in text:
+            text = f"{text} - {name}"
+    return text
 
 
 @register.simple_tag
+@instrumented("og_title")
 def og_title(text: str, request: HttpRequest | None = None):
     """Appends site name to end of title, if site name is available."""
-    if request and (site := get_current_site(request)):
-        if site.name not in text:
-            text = f"{text} - {site.name}"
-    return format_html(
-        strip_whitespace("""
-            <title>{text}</title>
-            <meta property="og:title" content="{text}"/>
-            <meta name="twitter:title" content="{text}"/>
-            """),
-        text=text,
-    )
+    return format_html(OG_TITLE_HTML, title=titled(text, request))
 
 
 @register.simple_tag
 def og_desc(text: str):
     """Appends description to open graph fields found in description template."""
-    return format_html(
-        strip_whitespace("""
-            <meta name="description" content="{text}"/>
-            <meta property="og:description" content="{text}"/>
-            <meta name="twitter:description" content="{text}"/>
-            """),
-        text=text,
-    )
+    return format_html(OG_DESC_HTML, desc=text)
 
 
 @register.simple_tag
 def og_img(url: str, alt: str):
     """Appends image details to open graph fields found in image template."""
+    return format_html(OG_IMG_HTML, url=url, img_alt=alt)
+
+
+@register.simple_tag
+@instrumented("og_meta")
+def og_meta(
+    title: str,
+    desc: str | None = None,
+    img: str | None = None,
+    alt: str = "",
+    request: HttpRequest | None = None,
+) -> SafeText:
+    """The output of `og_title`, `og_desc` and `og_img` in a single tag, the last two
+    only if `desc` and `img` are given.
+
+    Args:
+        title (str): The page title, to which the site name is added if `request` is given
+        desc (str | None, optional): The page description. Defaults to None.
+        img (str | None, optional): The url of the image to display when shared. Defaults to None.
+        alt (str, optional): The image's alternative text. Defaults to "".
+        request (HttpRequest | None, optional): Used to find the site name. Defaults to None.
+
+    Returns:
+        SafeText: The `<title>` and `<meta>` elements
+    """  # noqa: E501
+    html = OG_TITLE_HTML
+    if desc is not None:
+        html += OG_DESC_HTML
+    if img is not None:
+        html += OG_IMG_HTML
     return format_html(
-        strip_whitespace("""
-            <meta property="og:image" content="{url}"/>
-            <meta property="og:image:alt" content="{img_alt}"/>
-            <meta name="twitter:image" content="{url}"/>
-            <meta name="twitter:image:alt" content="{img_alt}"/>
-            """),
-        url=url,
-        img_alt=alt,
+        html, title=titled(title, request), desc=desc, url=img, img_alt=alt
     )
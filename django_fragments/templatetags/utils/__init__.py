@@ -1,2 +1,14 @@
 from .filter_attrs import filter_attrs
-from .wrap_svg import wrap_svg
+from .form_markup import escape_text, render_errors, render_widget
+from .fragment_cache import FragmentCache, fragment_caches
+from .icon_registry import IconRegistry, icons
+from .instrument import FragmentStats, collect, fragments_measured, instrumented
+from .js_bundle import JsBundle, minify_js, scripts
+from .md_blocks import MarkdownBlock, preview_html, render_blocks
+from .md_engine import MarkdownRenderer, markdowns
+from .md_workers import MarkdownWorkers, render_many
+from .memo import memoize_fragment
+from .minify import Minifier, StaticText, minify
+from .sprite import SpriteSheet
+from .url_cache import ReverseCache, urls
+from .wrap_svg import SvgMarkup, wrap_svg
@@ -0,0 +1,154 @@
+import html
+from pathlib import Path
+
+from django import forms
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.forms import BoundField
+from django.forms.utils import ErrorList, RenderableMixin
+from django.forms.widgets import Input, Widget
+from django.utils.functional import Promise
+from django.utils.safestring import SafeText, mark_safe
+
+DJANGO_TEMPLATES = Path(forms.__file__).parent / "templates"
+WIDGETS = "django/forms/widgets"
+INPUT_TEMPLATES = frozenset(
+    f"{WIDGETS}/{name}.html"
+    for name in (
+        "checkbox",
+        "date",
+        "datetime",
+        "email",
+        "file",
+        "hidden",
+        "number",
+        "password",
+        "text",
+        "time",
+        "url",
+    )
+)  # each only `{% include "django/forms/widgets/input.html" %}`
+INPUT = (f"{WIDGETS}/input.html", f"{WIDGETS}/attrs.html")
+ERRORS = ("django/forms/errors/list/default.html", "django/forms/errors/list/ul.html")
+
+# Rendering these templates through the form renderer costs more than the rest of
+# `hput` and `hform` together, so they are formatted here when they aren't overridden.
+_stock: dict[tuple[type, tuple[str, ...]], bool] = {}
+
+
+def _is_stock(renderer, *names: str) -> bool:
+    """Whether `renderer` resolves each template of `names` to Django's own file."""
+    key = (type(renderer), names)
+    if key not in _stock:
+        _stock[key] = all(
+            getattr(renderer.get_template(name).origin, "name", None)
+            == str(DJANGO_TEMPLATES / name)
+            for name in names
+        )
+    return _stock[key]
+
+
+def escape_text(value) -> str:
+    """`conditional_escape(value)`, i.e. `{{ value }}` of a string in a template, minus
+    the cost of the `keep_lazy` wrapper of Django's `escape()`.
+
+    Examples:
+        >>> escape_text('<a href="?">'), escape_text(mark_safe("<b>")), escape_text(None)
+        ('&lt;a href=&quot;?&quot;&gt;', '<b>', 'None')
+    """  # noqa: E501
+    if isinstance(value, Promise):
+        value = str(value)
+    if hasattr(value, "__html__"):
+        return value.__html__()
+    return html.escape(str(value))
+
+
+def render_widget(bound: BoundField) -> SafeText:
+    """`str(bound)`, formatted in Python when the widget is an `<input>` drawn by
+    Django's own templates, e.g. a `TextInput`, an `EmailInput` or a `HiddenInput`. Any
+    other widget, one with its own `render()` or template, or a field with
+    `show_hidden_initial` is rendered as usual.
+
+    Examples:
+        >>> from django import forms
+        >>> f = forms.Form()
+        >>> f.fields["q"] = forms.CharField(initial='a "b"', max_length=9)
+        >>> render_widget(f["q"]) == str(f["q"])
+        True
+        >>> render_widget(f["q"])
+        '<input type="text" name="q" value="a &quot;b&quot;" maxlength="9" required id="id_q">'
+
+    Args:
+        bound (BoundField): The field whose widget to render
+
+    Returns:
+        SafeText: The `<input>` element
+    """  # noqa: E501
+    field, widget = bound.field, bound.field.widget
+    if (
+        field.show_hidden_initial
+        or not isinstance(widget, Input)
+        or type(bound).as_widget is not BoundField.as_widget
+        or type(widget).render is not Widget.render
+        or type(widget)._render is not Widget._render
+        or widget.template_name not in INPUT_TEMPLATES
+        or not _is_stock(bound.form.renderer, widget.template_name, *INPUT)
+    ):
+        return str(bound)
+
+    # `BoundField.as_widget()`, up to `widget.render()`
+    if field.localize:
+        widget.is_localized = True
+    attrs = bound.build_widget_attrs({}, widget)
+    if bound.auto_id and "id" not in widget.attrs:
+        attrs.setdefault("id", bound.auto_id)
+    context = widget.get_context(bound.html_name, bound.value(), attrs)["widget"]
+
+    # `input.html` and the `attrs.html` it includes
+    esc = escape_text
+    markup = f'<input type="{esc(context["type"])}" name="{esc(context["name"])}"'
+    if context["value"] is not None:
+        markup += f' value="{esc(context["value"])}"'
+    for name, value in context["attrs"].items():
+        if value is True:
+            markup += f" {esc(name)}"
+        elif value is not False:
+            markup += f' {esc(name)}="{esc(value)}"'
+    return mark_safe(markup + ">")
+
+
+def render_errors(errors: ErrorList) -> SafeText:
+    """`str(errors)`, formatted in Python when the list is drawn by Django's own
+    `<ul class="errorlist">` templates.
+
+    Examples:
+        >>> render_errors(ErrorList(["Too <b>short</b>"], error_class="x"))
+        '<ul class="errorlist x"><li>Too &lt;b&gt;short&lt;/b&gt;</li></ul>'
+        >>> render_errors(ErrorList())
+        ''
+
+    Args:
+        errors (ErrorList): The errors of a form or one of its fields
+
+    Returns:
+        SafeText: The `<ul>` element, if there are errors
+    """
+    cls = type(errors)
+    if (
+        not isinstance(errors, ErrorList)
+        or cls.__html__ is not RenderableMixin.render
+        or cls.get_context is not ErrorList.get_context
+        or errors.template_name != ERRORS[0]
+        or not _is_stock(errors.renderer, *ERRORS)
+    ):
+        return str(errors)
+    if not errors:
+        return mark_safe("")
+    items = "".join(f"<li>{escape_text(error)}</li>" for error in errors)
+    return mark_safe(f'<ul class="{escape_text(errors.error_class)}">{items}</ul>')
+
+
+@receiver(setting_changed)
+def clear_on_templates_change(*, setting, **kwargs):
+    if setting in ("TEMPLATES", "FORM_RENDERER"):
+        _stock.clear()
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import inspect
+import time
+from collections.abc import Awaitable, Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http.request import HttpRequest
+
+
+def fingerprint(*parts: str) -> str:
+    """Identifies a fragment's source, e.g. the template name and the tokens between
+    `{% fragment_cache %}` and `{% endfragment_cache %}`, so that editing it changes the
+    key of its cached output.
+
+    Examples:
+        >>> fingerprint("nav.html", "<nav>") == fingerprint("nav.html", "<nav>")
+        True
+        >>> fingerprint("nav.html", "<nav>") == fingerprint("nav.html", "<nav >")
+        False
+    """
+    return hashlib.sha1("\0".join(parts).encode()).hexdigest()[:16]
+
+
+def htmx_variant(request: HttpRequest | None) -> tuple[bool, str]:
+    """Whether the request is made by htmx, see `is_htmx()`, and the id of the element
+    it targets: a partial and a full response may render the same fragment differently.
+    """
+    if request is None:
+        return (False, "")
+    if (htmx := getattr(request, "htmx", None)) is not None:
+        return (bool(htmx), htmx.target or "")
+    meta = request.META
+    return (bool(meta.get("HTTP_HX_REQUEST")), meta.get("HTTP_HX_TARGET", ""))
+
+
+class FragmentCache:
+    """Rendered fragments in a Django cache, `FRAGMENTS["fragment_cache"]` (default:
+    "default"), with stale-while-revalidate.
+
+    An entry is fresh for `timeout` seconds, then kept `stale` seconds more. A request
+    that finds it stale or missing takes a lock through `cache.add()`, which only one of
+    them gets, and renders the fragment again; meanwhile the others output the stale
+    copy or, for a missing one, wait up to `FRAGMENTS["fragment_cache_wait"]` seconds
+    (default: 0.5) for it to be stored, instead of all rendering it at once. A request
+    still without it after that renders it without storing it.
+    """
+
+    poll = 0.05  # seconds between reads while waiting for another request's render
+    lock_timeout = 10  # seconds a lost render holds the lock of a missing fragment
+
+    def key(
+        self,
+        name: str,
+        fingerprint: str,
+        vary_on: Iterable = (),
+        request: HttpRequest | None = None,
+    ) -> str:
+        hx_request, hx_target = htmx_variant(request)
+        parts = [str(v) for v in vary_on] + [str(int(hx_request)), hx_target]
+        digest = hashlib.sha256("\0".join(parts).encode()).hexdigest()
+        return f"fragments:cache:{name}:{fingerprint}:{digest}"
+
+    def get_or_render(
+        self,
+        key: str,
+        render: Callable[[], str],
+        timeout: float | None = 300,
+        stale: float = 0,
+        using: str | None = None,
+    ) -> str:
+        """The cached output at `key`, unless missing or stale, in which case the
+        output of `render()` is cached for `timeout` seconds (None: forever) plus
+        `stale` seconds in which it is served while being refreshed.
+
+        Examples:
+            >>> frags = FragmentCache()
+            >>> frags.get_or_render("fragments:cache:doc", lambda: "<p>1</p>")
+            '<p>1</p>'
+            >>> frags.get_or_render("fragments:cache:doc", lambda: "<p>2</p>")
+            '<p>1</p>'
+        """
+        cache, lock = self._cache(using), f"{key}:lock"
+        if (entry := cache.get(key)) is not None:
+            fresh_until, html = entry
+            if fresh_until is None or time.time() < fresh_until:
+                return html
+            if not cache.add(lock, 1, timeout=stale or 1):
+                return html  # another request is refreshing it
+        elif not cache.add(lock, 1, timeout=self.lock_timeout):
+            for _ in range(self._polls()):  # another request is rendering it
+                time.sleep(self.poll)
+                if (entry := cache.get(key)) is not None:
+                    return entry[1]
+            return render()
+        try:
+            html = render()
+            if stored := self._entry(html, timeout, stale):
+                cache.set(key, *stored)
+        finally:
+            cache.delete(lock)
+        return html
+
+    async def aget_or_render(
+        self,
+        key: str,
+        render: Callable[[], str | Awaitable[str]],
+        timeout: float | None = 300,
+        stale: float = 0,
+        using: str | None = None,
+    ) -> str:
+        """`get_or_render()` for async code, through the async methods of the cache;
+        `render` may return an awaitable. Concurrent tasks that find an entry stale
+        or missing contend for the same `cache.aadd()` lock as threads do."""
+        cache, lock = self._cache(using), f"{key}:lock"
+        if (entry := await cache.aget(key)) is not None:
+            fresh_until, html = entry
+            if fresh_until is None or time.time() < fresh_until:
+                return html
+            if not await cache.aadd(lock, 1, timeout=stale or 1):
+                return html  # another request is refreshing it
+        elif not await cache.aadd(lock, 1, timeout=self.lock_timeout):
+            for _ in range(self._polls()):  # another request is rendering it
+                await asyncio.sleep(self.poll)
+                if (entry := await cache.aget(key)) is not None:
+                    return entry[1]
+            html = render()
+            return await html if inspect.isawaitable(html) else html
+        try:
+            html = render()
+            if inspect.isawaitable(html):
+                html = await html
+            if stored := self._entry(html, timeout, stale):
+                await cache.aset(key, *stored)
+        finally:
+            await cache.adelete(lock)
+        return html
+
+    def _polls(self) -> int:
+        return round(settings.FRAGMENTS.get("fragment_cache_wait", 0.5) / self.poll)
+
+    def _cache(self, using: str | None):
+        return caches[using or settings.FRAGMENTS.get("fragment_cache", "default")]
+
+    def _entry(self, html: str, timeout: float | None, stale: float) -> tuple | None:
+        """The value and timeout to store, if any: the value records until when the
+        output is fresh, the timeout adds the stale period."""
+        if timeout is None:
+            return (None, html), None
+        if timeout > 0:
+            return (time.time() + timeout, html), timeout + stale
+        return None
+
+
+fragment_caches = FragmentCache()
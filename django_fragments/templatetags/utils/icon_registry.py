@@ -0,0 +1,161 @@
+import json
+import os
+from collections.abc import Iterator
+from pathlib import Path
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.template import Context, Engine
+from django.utils.functional import cached_property
+
+from .lru import CacheInfo, LRUCache
+from .wrap_svg import SvgMarkup
+
+
+class Icon(NamedTuple):
+    path: Path
+    mtime: int | None
+    svg: SvgMarkup
+
+
+class IconRegistry:
+    """Process-wide store of `<svg>` icons, each loaded from its file and normalized exactly once.
+
+    Entries are keyed by `(prefix, folder, name)`, the same values that `{% icon %}` uses
+    to build the path `<folder>/<prefix>_<name>.html`. The registry is bounded by
+    `FRAGMENTS["icons_cache_size"]` (default: 128), discarding the least recently used
+    icon when full.
+
+    When `settings.DEBUG` is on, each lookup compares the file's modification time with
+    the one recorded on load so that edits to an icon are picked up without a restart.
+    The file is read directly rather than through the template loaders since their
+    cached loader would otherwise keep serving the stale markup.
+
+    `generation` is bumped whenever icons already handed out may have changed, i.e. on
+    reload, preload and clear, so that caches built from icons know to discard entries.
+    """  # noqa: E501
+
+    def __init__(self, maxsize: int | None = None):
+        self._maxsize = maxsize
+        self.generation = 0
+
+    @cached_property
+    def _cache(self) -> LRUCache:
+        if self._maxsize is None:
+            self._maxsize = settings.FRAGMENTS.get("icons_cache_size", 128)
+        return LRUCache(maxsize=self._maxsize, name="icons")
+
+    def get(self, name: str, prefix: str, folder: Path) -> Icon:
+        """Retrieve the parsed icon, loading it from `folder` on a miss or, in DEBUG, when the file changed."""  # noqa: E501
+        key = (prefix, Path(folder), name)
+        icon = self._cache.get(key)
+        if icon is None:
+            icon = self.load(*key)
+            self._cache.set(key, icon)
+        elif settings.DEBUG and icon.mtime != _mtime(icon.path):
+            icon = self.load(*key)
+            self._cache.set(key, icon)
+            self.generation += 1
+        return icon
+
+    def load(self, prefix: str, folder: Path, name: str) -> Icon:
+        path = folder / f"{prefix}_{name}.html"
+        return Icon(path=path, mtime=_mtime(path), svg=SvgMarkup(_render(path)))
+
+    def preload(self, prefix: str | None = None, folder: Path | None = None) -> int:
+        """Load every `<prefix>_*.html` file found in `folder`, defaulting to `FRAGMENTS["icons_prefix"]` and `FRAGMENTS["icons_path"]`.
+
+        Args:
+            prefix (str | None, optional): Source of the svg files. Defaults to None.
+            folder (Path | None, optional): Where the svg files are found. Defaults to None.
+
+        Returns:
+            int: Number of icons loaded
+        """  # noqa: E501
+        count = 0
+        for prefix, folder, name in _discover(prefix, folder):
+            self._cache.set((prefix, folder, name), self.load(prefix, folder, name))
+            count += 1
+        self.generation += 1
+        return count
+
+    async def apreload(
+        self, prefix: str | None = None, folder: Path | None = None
+    ) -> int:
+        """`preload()` in a worker thread, for async code that can't block on reading
+        the files, e.g. a warm-up task scheduled at startup."""
+        return await sync_to_async(self.preload, thread_sensitive=False)(prefix, folder)
+
+    def dump_manifest(
+        self, target: Path, prefix: str | None = None, folder: Path | None = None
+    ) -> int:
+        """Render every `<prefix>_*.html` file found in `folder` into a single json file
+        that `load_manifest()` can read without touching `folder`.
+
+        Returns:
+            int: Number of icons written
+        """
+        entries = [
+            {
+                "prefix": prefix,
+                "name": name,
+                "mtime": _mtime(path := folder / f"{prefix}_{name}.html"),
+                "markup": _render(path),
+            }
+            for prefix, folder, name in _discover(prefix, folder)
+        ]
+        Path(target).write_text(json.dumps({"icons": entries}, indent=1))
+        return len(entries)
+
+    def load_manifest(self, source: Path, folder: Path | None = None) -> int:
+        """Fill the registry from a json file made by `dump_manifest()`. Entries are
+        keyed to `folder`, defaulting to `FRAGMENTS["icons_path"]`, so the manifest can
+        be built in one location and deployed to another.
+
+        Returns:
+            int: Number of icons loaded
+        """
+        folder = Path(folder or settings.FRAGMENTS.get("icons_path"))
+        entries = json.loads(Path(source).read_text())["icons"]
+        for entry in entries:
+            prefix, name = entry["prefix"], entry["name"]
+            icon = Icon(
+                path=folder / f"{prefix}_{name}.html",
+                mtime=entry["mtime"],
+                svg=SvgMarkup(entry["markup"]),
+            )
+            self._cache.set((prefix, folder, name), icon)
+        self.generation += 1
+        return len(entries)
+
+    def cache_info(self) -> CacheInfo:
+        """Hits, misses, evictions, maximum and current size of the registry."""
+        return self._cache.cache_info()
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self.generation += 1
+
+
+def _discover(
+    prefix: str | None, folder: Path | None
+) -> Iterator[tuple[str, Path, str]]:
+    prefix = prefix or settings.FRAGMENTS.get("icons_prefix")
+    folder = Path(folder or settings.FRAGMENTS.get("icons_path"))
+    for path in sorted(folder.glob(f"{prefix}_*.html")):
+        yield prefix, folder, path.stem.removeprefix(f"{prefix}_")
+
+
+def _render(path: Path) -> str:
+    return Engine.get_default().from_string(path.read_text()).render(Context())
+
+
+def _mtime(path: Path) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+icons = IconRegistry()
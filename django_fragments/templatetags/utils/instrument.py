@@ -0,0 +1,160 @@
+import functools
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.dispatch import Signal
+
+# Sent once per collected request, with `request` and `stats`, a `FragmentStats`.
+fragments_measured = Signal()
+
+_current: ContextVar["FragmentStats | None"] = ContextVar("fragments", default=None)
+# The innermost instrumented tag being rendered, to which cache lookups are counted.
+_tag: ContextVar["TagStats | None"] = ContextVar("fragments_tag", default=None)
+
+
+class TagStats:
+    __slots__ = ("calls", "durations", "bytes", "hits", "misses")
+
+    def __init__(self):
+        self.calls = 0
+        self.durations: list[float] = []
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+
+class CacheStats:
+    __slots__ = ("hits", "misses")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+
+class FragmentStats:
+    """What the instrumented tags did while collecting: per tag, the calls, their
+    durations, the UTF-8 bytes output and the hits and misses of the lookups made in
+    them, and per named cache, e.g. `urls` that both `nava` and `navmenu` use, the hits
+    and misses of all its lookups. Lookups are counted as they happen, so concurrent
+    requests, each with its own stats, don't count each other's.
+
+    Examples:
+        >>> from .lru import LRUCache
+        >>> cache = LRUCache(name="shouts")
+        >>> def shout(text):
+        ...     if (loud := cache.get(text)) is None:
+        ...         cache.set(text, loud := text.upper())
+        ...     return loud
+        >>> with collect() as stats:
+        ...     _ = [instrumented("shout")(shout)(t) for t in ("hey", "hey", "hé")]
+        >>> row = stats.summary()["shout"]
+        >>> row["calls"], row["bytes"], round(row["hit_rate"], 2)
+        (3, 9, 0.33)
+        >>> stats.cache_summary()
+        {'shouts': {'hits': 1, 'misses': 2, 'hit_rate': 0.3333333333333333}}
+    """
+
+    def __init__(self):
+        self.tags: dict[str, TagStats] = {}
+        self.caches: dict[str, CacheStats] = {}
+
+    def tag(self, name: str) -> TagStats:
+        if (tag := self.tags.get(name)) is None:
+            tag = self.tags[name] = TagStats()
+        return tag
+
+    def record(self, tag: TagStats, duration: float, output) -> None:
+        tag.calls += 1
+        tag.durations.append(duration)
+        tag.bytes += len(output.encode()) if isinstance(output, str) else 0
+
+    def lookup(self, cache: str, hit: bool) -> None:
+        if (shared := self.caches.get(cache)) is None:
+            shared = self.caches[cache] = CacheStats()
+        for counter in (shared, _tag.get()):
+            if counter is not None:
+                if hit:
+                    counter.hits += 1
+                else:
+                    counter.misses += 1
+
+    def cache_summary(self) -> dict[str, dict]:
+        """Per named cache: `hits`, `misses` and `hit_rate` (None without lookups)."""
+        return {
+            name: {
+                "hits": c.hits,
+                "misses": c.misses,
+                "hit_rate": c.hits / (c.hits + c.misses) if c.hits + c.misses else None,
+            }
+            for name, c in sorted(self.caches.items())
+        }
+
+    def summary(self) -> dict[str, dict]:
+        """Per tag, sorted by total time: `calls`, `total_ms`, `p95_ms`, `bytes` and
+        the `hit_rate` of the cache lookups made by the tag itself rather than by a tag
+        nested in it (None without lookups)."""
+        rows = {}
+        tags = ((name, tag) for name, tag in self.tags.items() if tag.calls)
+        for name, tag in sorted(tags, key=lambda i: -sum(i[1].durations)):
+            durations = sorted(tag.durations)
+            lookups = tag.hits + tag.misses
+            rows[name] = {
+                "calls": tag.calls,
+                "total_ms": sum(durations) * 1000,
+                "p95_ms": durations[int(0.95 * (len(durations) - 1))] * 1000,
+                "bytes": tag.bytes,
+                "hit_rate": tag.hits / lookups if lookups else None,
+            }
+        return rows
+
+
+@contextmanager
+def collect() -> Iterator[FragmentStats]:
+    """Record the instrumented tags rendered within the block, in this thread or task.
+    Nested blocks share the outermost block's stats."""
+    if (stats := _current.get()) is not None:
+        yield stats
+        return
+    stats = FragmentStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def count_lookup(cache: str, hit: bool) -> None:
+    """Count a lookup of the named `cache` in the stats being collected, if any."""
+    if (stats := _current.get()) is not None:
+        stats.lookup(cache, hit)
+
+
+def instrumented(name: str) -> Callable:
+    """Time the decorated tag, filter or `Node.render` while a `collect()` block is
+    active; otherwise the only cost is a context variable lookup.
+
+    The lookups of a named `LRUCache` made during the call, e.g. of the icons or of a
+    function decorated with `memoize_fragment`, are counted to the tag, unless made by
+    another instrumented tag nested in it.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if (stats := _current.get()) is None:
+                return fn(*args, **kwargs)
+            tag = stats.tag(name)
+            token = _tag.set(tag)
+            start = time.perf_counter()
+            try:
+                output = fn(*args, **kwargs)
+            finally:
+                _tag.reset(token)
+            stats.record(tag, time.perf_counter() - start, output)
+            return output
+
+        return wrapper
+
+    return decorator
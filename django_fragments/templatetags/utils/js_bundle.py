@@ -0,0 +1,106 @@
+import hashlib
+from collections.abc import Iterable
+from pathlib import Path
+
+from django.conf import settings
+
+STATIC_DIR = Path(__file__).parents[2] / "static"
+
+# `doTheme.js` isn't bundled: `themeHTML()` is called inline before `<html>` so that
+# the page is painted in the right theme, which needs the script loaded, not deferred.
+SCRIPTS = ("doDropCommon.js", "doDropSelect.js", "doDropMenu.js")
+
+
+def minify_js(source: str) -> str:
+    """Remove the comments, indentation and blank lines of a script, keeping each
+    remaining line on its own so that automatic semicolon insertion is unaffected.
+
+    Quotes and template literals are skipped, but not regular expression literals: a
+    source mustn't have a quote, `//` or `/*` in one. Multi-line template literals lose
+    their indentation.
+
+    Examples:
+        >>> minify_js('/** Doc */\\nfunction f(a) {\\n  // note\\n  return "a // b";\\n}\\n')
+        'function f(a) {\\nreturn "a // b";\\n}'
+        >>> minify_js("const re = /\\\\d+$/; /* gone */ const s = `${re}`;")
+        'const re = /\\\\d+$/;  const s = `${re}`;'
+    """  # noqa: E501
+    out, i, quote = [], 0, None
+    while i < len(source):
+        char = source[i]
+        if quote:
+            if char == "\\":
+                out.append(source[i : i + 2])
+                i += 2
+                continue
+            if char == quote:
+                quote = None
+        elif source.startswith("//", i):
+            end = source.find("\n", i)
+            i = len(source) if end == -1 else end
+            continue
+        elif source.startswith("/*", i):
+            i = source.index("*/", i) + 2
+            continue
+        elif char in "'\"`":
+            quote = char
+        out.append(char)
+        i += 1
+    lines = (line.strip() for line in "".join(out).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+class JsBundle:
+    """The scripts of the fragments, e.g. those that `doSelect()` and `doMenu()` need,
+    minified into one file named after a hash of its content, `fragments/<hash>.js`,
+    with a gzipped `.gz` sibling for servers that send precompressed files.
+
+    Since the name changes with the content, the bundle can be served with a far
+    future, `immutable` `Cache-Control`. Until it is built, and whenever a script has
+    changed since, `{% fragments_js %}` refers to the scripts one by one instead.
+    """
+
+    def __init__(self, names: Iterable[str] = SCRIPTS, folder: Path = STATIC_DIR):
+        self.names = tuple(names)
+        self.folder = folder
+        self._reference: tuple[str, ...] | None = None
+
+    def source(self) -> str:
+        return ";\n".join(minify_js((self.folder / n).read_text()) for n in self.names)
+
+    def name(self, source: str | None = None) -> str:
+        """Static path of the bundle of the current scripts."""
+        source = self.source() if source is None else source
+        return f"fragments/{hashlib.sha256(source.encode()).hexdigest()[:12]}.js"
+
+    def build(self, output: Path) -> Path:
+        """Write the bundle and its `.gz` sibling under `output`, a static folder.
+
+        Returns:
+            Path: The bundle written
+        """
+        import gzip
+
+        source = self.source()
+        target = Path(output) / self.name(source)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(source)
+        data = source.encode()
+        Path(f"{target}.gz").write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+        return target
+
+    def reference(self) -> tuple[str, ...]:
+        """Static paths for the page to load: the bundle if a static files finder
+        finds it or it is in `STATIC_ROOT`, otherwise each script. Looked up once,
+        unless in DEBUG."""
+        if self._reference is None or settings.DEBUG:
+            from django.contrib.staticfiles import finders
+
+            name = self.name()
+            root = settings.STATIC_ROOT
+            built = finders.find(name) or (root and Path(root, name).exists())
+            self._reference = (name,) if built else self.names
+        return self._reference
+
+
+scripts = JsBundle()
@@ -0,0 +1,91 @@
+from collections import OrderedDict
+from collections.abc import Hashable
+from threading import RLock
+from typing import Any, NamedTuple
+
+from .instrument import count_lookup
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int
+    currsize: int
+
+
+class LRUCache:
+    """A bounded, thread-safe mapping that discards the least recently used entry
+    once `maxsize` is exceeded. Keeps count of hits, misses and evictions in the
+    same spirit as `functools.lru_cache().cache_info()`. The lookups of a cache with a
+    `name` are also counted in the `FragmentStats` being collected, see `collect()`.
+
+    Examples:
+        >>> cache = LRUCache(maxsize=2)
+        >>> cache.set("a", 1)
+        >>> cache.set("b", 2)
+        >>> cache.get("a")
+        1
+        >>> cache.set("c", 3)  # "b" is the least recently used
+        >>> cache.get("b") is None
+        True
+        >>> cache.cache_info()
+        CacheInfo(hits=1, misses=1, evictions=1, maxsize=2, currsize=2)
+    """
+
+    def __init__(self, maxsize: int = 128, name: str | None = None):
+        self.maxsize = maxsize
+        self.name = name
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = RLock()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                value, hit = default, False
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+                hit = True
+        if self.name:
+            count_lookup(self.name, hit)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def keys(self) -> list[Hashable]:
+        with self._lock:
+            return list(self._data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(
+                self.hits, self.misses, self.evictions, self.maxsize, len(self._data)
+            )
@@ -0,0 +1,207 @@
+import hashlib
+import re
+from typing import NamedTuple
+
+from django.utils.html import escape
+
+from .md_engine import Extensions, fingerprint, markdowns, normalize_exts
+
+FENCE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+LIST_ITEM = re.compile(r"^ {0,3}([*+-]|\d+[.)])\s")
+QUOTE = re.compile(r"^ {0,3}>")
+HTML_OPEN = re.compile(r"^ {0,3}<([a-zA-Z][\w-]*)")
+COMMENT_OPEN = re.compile(r"^ {0,3}<!--", re.MULTILINE)
+REF_DEF = re.compile(r"^ {0,3}\[([^\[\]]+)\]:[ \t]*\S")
+REF_USE = re.compile(r"\[([^\[\]]+)\]")
+
+# Extensions whose output depends on the whole document once their marker appears in
+# it, e.g. footnote numbering; "" means always.
+DOCUMENT_EXTS = {"footnotes": "[^", "abbr": "*[", "toc": ""}
+
+
+class MarkdownBlock(NamedTuple):
+    hash: str
+    html: str
+
+
+def _label(label: str) -> str:
+    return " ".join(label.split()).lower()
+
+
+def _ext_name(ext) -> str:
+    name = ext if isinstance(ext, str) else type(ext).__module__
+    return name.rpartition(".")[2].removeprefix("mdx_")
+
+
+def _comment_open(text: str) -> bool:
+    """Whether a comment started at the beginning of a line, which the parser takes as
+    raw html up to its `-->` even across blank lines, is still missing its `-->`.
+
+    Examples:
+        >>> _comment_open("para\\n<!-- a -->\\n<!-- b"), _comment_open("x <!-- inline")
+        (True, False)
+    """
+    pos = 0
+    for m in COMMENT_OPEN.finditer(text):
+        if m.start() >= pos:
+            if (end := text.find("-->", m.end())) == -1:
+                return True
+            pos = end + 3
+    return False
+
+
+def _html_open(lines: list[str]) -> bool:
+    """Whether a raw html block is still missing the closing tag of its first element,
+    or a comment in the block its `-->`."""
+    if _comment_open("\n".join(lines)):
+        return True
+    if not (m := HTML_OPEN.match(lines[0])):
+        return False
+    text, tag = "\n".join(lines), m[1]
+    return len(re.findall(rf"<{tag}\b", text)) > len(re.findall(rf"</{tag}\s*>", text))
+
+
+def split_blocks(text: str) -> list[str]:
+    """Split Markdown at the blank lines where the parser would start a new top-level
+    block, so that converting each block on its own gives the same html as converting
+    the whole. Fenced code, raw html elements and comments, indented continuations and
+    consecutive list items or quotes stay together.
+
+    Examples:
+        >>> split_blocks("# Title\\n\\nSome *text*\\n\\n- a\\n\\n- b\\n\\n```\\nx\\n\\ny\\n```")
+        ['# Title', 'Some *text*', '- a\\n\\n- b', '```\\nx\\n\\ny\\n```']
+    """  # noqa: E501
+    blocks: list[list[str]] = []
+    current: list[str] = []
+    gap: list[str] = []
+    fence = None
+    for line in text.replace("\r\n", "\n").split("\n"):
+        if fence:
+            current.append(line)
+            if line.strip().startswith(fence) and not line.strip().strip(fence[0]):
+                fence = None
+            continue
+        if not line.strip():
+            if current and _html_open(current):
+                current.append(line)
+            elif current:
+                blocks.append(current)
+                current, gap = [], [line]
+            elif blocks:
+                gap.append(line)
+            continue
+        if not current and blocks:
+            first = blocks[-1][0]
+            indented = line[:1] in (" ", "\t") and not LIST_ITEM.match(line)
+            if (
+                indented
+                or (LIST_ITEM.match(line) and LIST_ITEM.match(first))
+                or (QUOTE.match(line) and QUOTE.match(first))
+            ):
+                current = blocks.pop() + gap
+        gap = []
+        if m := FENCE.match(line):
+            fence = m[1]
+        current.append(line)
+    if current:
+        blocks.append(current)
+    return ["\n".join(block) for block in blocks]
+
+
+def render_blocks(text: str, exts: Extensions = ("attr_list",)) -> list[MarkdownBlock]:
+    """Convert Markdown one top-level block at a time, see `split_blocks()`. Each block
+    goes through the `md` cache of `MarkdownRenderer` on its own, so editing one
+    paragraph of a long document only converts that paragraph again.
+
+    Reference-style links resolve across blocks: a block is converted together with the
+    definitions it may refer to, which are thus part of its cache key, so changing a
+    definition only invalidates the blocks that use it. Documents that need
+    whole-document processing (footnotes, abbreviations, tables of contents) are
+    converted as a single block.
+
+    Examples:
+        >>> blocks = render_blocks("See [docs][1]\\n\\nPlain\\n\\n[1]: https://x.dev")
+        >>> [b.html for b in blocks]
+        ['<p>See <a href="https://x.dev">docs</a></p>', '<p>Plain</p>', '']
+        >>> len(blocks[0].hash)
+        16
+
+    Args:
+        text (str): Markdown
+        exts (Extensions, optional): As in the `md` filter. Defaults to ("attr_list",).
+
+    Returns:
+        list[MarkdownBlock]: The hash of each block's source and its html
+    """  # noqa: E501
+    text, exts = str(text), normalize_exts(exts)
+    names = {_ext_name(ext) for ext in exts}
+    if any(marker in text for n, marker in DOCUMENT_EXTS.items() if n in names):
+        blocks = [text]
+    else:
+        blocks = split_blocks(text)
+
+    definitions: dict[str, str] = {}
+    for block in blocks:
+        for line in block.split("\n"):
+            if m := REF_DEF.match(line):
+                definitions[_label(m[1])] = line.strip()
+
+    results = []
+    for block in blocks:
+        used = {_label(label) for label in REF_USE.findall(block)}
+        refs = sorted(definitions[label] for label in used if label in definitions)
+        source = "\n\n".join([block, *refs]) if refs else block
+        digest = hashlib.sha256(f"{fingerprint(exts)}{source}".encode()).hexdigest()[
+            :16
+        ]
+        results.append(MarkdownBlock(digest, markdowns.render(source, exts)))
+    return results
+
+
+def _block_div(target: str, index: int, block: MarkdownBlock, oob: str = "") -> str:
+    swap = f' hx-swap-oob="{oob}"' if oob else ""
+    return (
+        f'<div id="{target}-{index}" data-md-hash="{block.hash}"{swap}>'
+        f"{block.html}</div>"
+    )
+
+
+def preview_html(blocks: list[MarkdownBlock], target: str) -> str:
+    """The complete preview: a `<div id="{target}">` with a child per block, whose id is
+    its position and whose `data-md-hash` identifies its source.
+
+    Examples:
+        >>> preview_html([MarkdownBlock("ab12", "<p>x</p>")], "pv")
+        '<div id="pv"><div id="pv-0" data-md-hash="ab12"><p>x</p></div></div>'
+    """
+    target = escape(target)
+    children = (_block_div(target, i, b) for i, b in enumerate(blocks))
+    return f'<div id="{target}">{"".join(children)}</div>'
+
+
+def preview_oob(blocks: list[MarkdownBlock], previous: list[str], target: str) -> str:
+    """Out-of-band swaps turning the preview that has the `previous` block hashes into
+    the one for `blocks`: changed blocks are replaced, extra ones appended to the
+    preview and surplus ones deleted. Blocks that are unchanged aren't sent at all.
+
+    Examples:
+        >>> old = [MarkdownBlock("a", "<p>a</p>"), MarkdownBlock("b", "<p>b</p>")]
+        >>> preview_oob([old[0]], ["a", "b"], "pv")
+        '<div id="pv-1" hx-swap-oob="delete"></div>'
+        >>> preview_oob([old[0], MarkdownBlock("c", "<p>c</p>")], ["a"], "pv")
+        '<div hx-swap-oob="beforeend:#pv"><div id="pv-1" data-md-hash="c"><p>c</p></div></div>'
+    """  # noqa: E501
+    target = escape(target)
+    swaps, appended = [], []
+    for i, block in enumerate(blocks):
+        if i >= len(previous):
+            appended.append(_block_div(target, i, block))
+        elif previous[i] != block.hash:
+            swaps.append(_block_div(target, i, block, oob="true"))
+    for i in range(len(blocks), len(previous)):
+        swaps.append(f'<div id="{target}-{i}" hx-swap-oob="delete"></div>')
+    if appended:
+        swaps.append(
+            f'<div hx-swap-oob="beforeend:#{target}">{"".join(appended)}</div>'
+        )
+    return "".join(swaps)
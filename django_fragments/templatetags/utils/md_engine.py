@@ -0,0 +1,173 @@
+import asyncio
+import functools
+import hashlib
+from collections import defaultdict
+from collections.abc import Iterable
+from threading import Lock
+from typing import TYPE_CHECKING
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.functional import cached_property
+
+from .lru import CacheInfo, LRUCache
+
+if TYPE_CHECKING:
+    import markdown
+
+# Python-Markdown, with the extensions it loads, is imported on the first conversion.
+Extensions = Iterable["str | markdown.Extension"] | str
+
+
+def normalize_exts(exts: Extensions) -> tuple:
+    """Extensions as a hashable tuple; a string is read as a comma-separated list so
+    that the filter can be called as `{{ text|md:"attr_list,footnotes" }}`.
+
+    Examples:
+        >>> normalize_exts("attr_list, footnotes")
+        ('attr_list', 'footnotes')
+        >>> normalize_exts(["attr_list"])
+        ('attr_list',)
+    """
+    if isinstance(exts, str):
+        return tuple(e.strip() for e in exts.split(",") if e.strip())
+    return tuple(exts)
+
+
+@functools.lru_cache(maxsize=64)
+def fingerprint(exts: tuple) -> str:
+    """Identifies the output of a given Markdown version + extension set, including the
+    config of any extension instance."""
+    import markdown
+
+    parts = [markdown.__version__]
+    for ext in exts:
+        if isinstance(ext, str):
+            parts.append(ext)
+        else:
+            kls, configs = type(ext), sorted(ext.getConfigs().items())
+            parts.append(f"{kls.__module__}.{kls.__qualname__}{configs}")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+
+class MarkdownPool:
+    """Idle `markdown.Markdown` instances per extension set. Building an instance loads
+    every extension, so each is reused, after a `reset()`, instead of discarded.
+    An instance is only ever used by one thread at a time."""
+
+    def __init__(self, max_idle: int = 8):
+        self.max_idle = max_idle
+        self._idle: defaultdict[tuple, list["markdown.Markdown"]] = defaultdict(list)
+        self._lock = Lock()
+
+    def convert(self, text: str, exts: tuple) -> str:
+        with self._lock:
+            engine = self._idle[exts].pop() if self._idle[exts] else None
+        if engine is None:
+            import markdown
+
+            engine = markdown.Markdown(extensions=list(exts))
+        try:
+            return engine.convert(text)
+        finally:
+            engine.reset()
+            with self._lock:
+                if len(self._idle[exts]) < self.max_idle:
+                    self._idle[exts].append(engine)
+
+
+class MarkdownRenderer:
+    """Markdown to html through pooled engines, with a two-level output cache keyed by
+    the text's content hash and the extension fingerprint:
+
+    1. an in-process LRU of `FRAGMENTS["md_cache_size"]` entries (default: 256); and
+    2. if `FRAGMENTS["md_cache"]` names a Django cache alias, that cache, with entries
+        kept for `FRAGMENTS["md_cache_timeout"]` seconds (default: None, i.e. forever).
+
+    Since the fingerprint includes the Markdown version, a document is rendered once per
+    deploy rather than once per view.
+
+    A text longer than `FRAGMENTS["md_offload_size"]` characters (default: None, never)
+    is converted in one of `FRAGMENTS["md_offload_processes"]` (default: 2) worker
+    processes instead, see `MarkdownWorkers`, so that it can't stall the thread beyond
+    `FRAGMENTS["md_offload_timeout"]` seconds (default: 5), or twice that when all the
+    workers are busy.
+    """
+
+    def __init__(self):
+        self.pool = MarkdownPool()
+
+    @cached_property
+    def _cache(self) -> LRUCache:
+        return LRUCache(maxsize=settings.FRAGMENTS.get("md_cache_size", 256), name="md")
+
+    @property
+    def _shared(self):
+        alias = settings.FRAGMENTS.get("md_cache")
+        return caches[alias] if alias else None
+
+    def key(self, text: str, exts: tuple) -> str:
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        return f"fragments:md:{fingerprint(exts)}:{digest}"
+
+    def cached(self, key: str) -> str | None:
+        if (html := self._cache.get(key)) is not None:
+            return html
+        if (shared := self._shared) and (html := shared.get(key)) is not None:
+            self._cache.set(key, html)
+        return html
+
+    def store(self, key: str, html: str) -> None:
+        self._cache.set(key, html)
+        if shared := self._shared:
+            timeout = settings.FRAGMENTS.get("md_cache_timeout")
+            shared.set(key, html, timeout=timeout)
+
+    def render(self, text: str, exts: Extensions = ("attr_list",)) -> str:
+        text, exts = str(text), normalize_exts(exts)
+        key = self.key(text, exts)
+        if (html := self.cached(key)) is not None:
+            return html
+        limit = settings.FRAGMENTS.get("md_offload_size")
+        if limit and len(text) > limit:
+            from .md_workers import offload
+
+            timeout = settings.FRAGMENTS.get("md_offload_timeout", 5)
+            result = offload(text, exts, timeout=timeout)
+            if not result.ok:
+                return result.html  # the fallback isn't worth keeping
+            html = result.html
+        else:
+            html = self.pool.convert(text, exts)
+        self.store(key, html)
+        return html
+
+    async def arender(self, text: str, exts: Extensions = ("attr_list",)) -> str:
+        """`render()` for async code: a document in the in-process cache is returned
+        as is, any other is looked up in the shared cache or converted in a worker
+        thread, so the event loop isn't blocked."""
+        if self.key(str(text), normalize_exts(exts)) in self._cache:
+            return self.render(text, exts)
+        return await sync_to_async(self.render, thread_sensitive=False)(text, exts)
+
+    async def awarm(
+        self, texts: Iterable[str], exts: Extensions = ("attr_list",)
+    ) -> int:
+        """Convert `texts` concurrently, e.g. the pages most likely to be requested
+        first, so that the filter finds them cached.
+
+        Returns:
+            int: Number of documents rendered or found cached
+        """
+        return len(await asyncio.gather(*(self.arender(t, exts) for t in texts)))
+
+    def cache_info(self) -> CacheInfo:
+        """Hits, misses, evictions, maximum and current size of the in-process cache."""
+        return self._cache.cache_info()
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+markdowns = MarkdownRenderer()
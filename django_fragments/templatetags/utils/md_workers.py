@@ -0,0 +1,299 @@
+import functools
+import os
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from threading import Condition, Lock
+from typing import NamedTuple
+
+from django.conf import settings
+from django.utils.html import linebreaks
+
+from .md_engine import Extensions, MarkdownPool, markdowns, normalize_exts
+
+
+class Rendered(NamedTuple):
+    html: str
+    ok: bool
+
+
+def fallback(text: str) -> str:
+    """What a document that couldn't be converted becomes: its escaped text, in paragraphs."""  # noqa: E501
+    return linebreaks(text, autoescape=True)
+
+
+def _serve(conn):
+    """Worker process loop: convert each `(text, exts)` received until `None`."""
+    pool = MarkdownPool(max_idle=1)
+    while (task := conn.recv()) is not None:
+        try:
+            conn.send((True, pool.convert(*task)))
+        except Exception as e:
+            conn.send((False, repr(e)))
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_serve, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.index: int | None = None
+        self.started = 0.0
+
+    def send(self, index: int, text: str, exts: tuple):
+        self.index, self.started = index, time.monotonic()
+        self.conn.send((text, exts))
+
+    def stop(self, kill: bool = False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class MarkdownWorkers:
+    """A set of worker processes, each converting one document at a time, so that the
+    time spent on every document is known exactly. A worker that exceeds the timeout,
+    or dies, is killed and replaced; its document, like one exceeding the size limit,
+    becomes its `fallback()`.
+
+    Workers are started on first use and kept for subsequent calls. Concurrent calls to
+    `map()`, e.g. from different threads, share them: each checks workers out of the
+    set while it has documents for them, so a call only waits, up to `wait` seconds,
+    when all of them are busy converting the documents of others.
+    """
+
+    def __init__(self, processes: int | None = None):
+        self.processes = processes or os.cpu_count() or 1
+        self._idle: list[_Worker] = []
+        self._started = 0
+        self._available = Condition(Lock())
+
+    def _checkout(self, ctx, wanted: int, wait: float | None) -> list[_Worker]:
+        """Up to `wanted` workers, idle or newly started, waiting up to `wait` seconds
+        (None: indefinitely) for at least one."""
+        with self._available:
+            if not self._available.wait_for(
+                lambda: self._idle or self._started < self.processes, wait
+            ):
+                return []
+            taken, self._idle = self._idle[:wanted], self._idle[wanted:]
+            spawn = min(wanted - len(taken), self.processes - self._started)
+            self._started += spawn
+        return taken + [_Worker(ctx) for _ in range(spawn)]
+
+    def _checkin(self, workers: Iterable[_Worker], dropped: int = 0):
+        with self._available:
+            self._idle.extend(workers)
+            self._started -= dropped
+            self._available.notify_all()
+
+    def map(
+        self,
+        texts: Iterable[str],
+        exts: Extensions = ("attr_list",),
+        timeout: float | None = None,
+        max_size: int | None = None,
+        wait: float | None = None,
+    ) -> Iterator[Rendered]:
+        """Convert `texts` across the workers, yielding results in input order as soon
+        as they are available. At most a few documents per worker are read ahead of the
+        last one yielded, so `texts` can be a lazy iterable of any length.
+
+        Args:
+            texts (Iterable[str]): Markdown documents
+            exts (Extensions, optional): Shared by all documents. Defaults to ("attr_list",).
+            timeout (float | None, optional): Seconds allowed per document. Defaults to None.
+            max_size (int | None, optional): Longer documents aren't converted. Defaults to None.
+            wait (float | None, optional): Seconds to wait for a worker while all are busy elsewhere; the documents then queued become their fallback. Defaults to None.
+
+        Yields:
+            Rendered: The html and whether it is the actual conversion
+        """  # noqa: E501
+        import multiprocessing
+        from multiprocessing.connection import wait as ready
+
+        exts = normalize_exts(exts)
+        # Workers are (re)started mid-request, often in one of many threads, and a
+        # forked child can inherit a lock that another thread held at the time, never
+        # to be released; `_serve` needs nothing from this process, so start afresh.
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            ctx = multiprocessing.get_context("forkserver")
+            # imported once by the server, not by each worker, if it isn't running yet
+            ctx.set_forkserver_preload(["__main__", __name__, "markdown"])
+        else:
+            ctx = multiprocessing.get_context("spawn")
+        idle: list[_Worker] = []
+        busy: dict = {}
+        texts_by_index: dict[int, str] = {}
+        pending: deque[int] = deque()
+        done: dict[int, Rendered] = {}
+        source, exhausted = iter(texts), False
+        read = yielded = 0
+        window = self.processes * 4
+
+        def discard(worker: _Worker) -> _Worker:
+            """Kill `worker`, whose document becomes its fallback, and replace it."""
+            worker.stop(kill=True)
+            text = texts_by_index.pop(worker.index)
+            done[worker.index] = Rendered(fallback(text), False)
+            return _Worker(ctx)
+
+        try:
+            while True:
+                while not exhausted and read - yielded < window:
+                    try:
+                        text = str(next(source))
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if max_size is not None and len(text) > max_size:
+                        done[read] = Rendered(fallback(text), False)
+                    else:
+                        texts_by_index[read] = text
+                        pending.append(read)
+                    read += 1
+                if pending and not idle:
+                    idle += self._checkout(ctx, len(pending), 0 if busy else wait)
+                    while pending and not idle and not busy:  # none came in time
+                        index = pending.popleft()
+                        done[index] = Rendered(
+                            fallback(texts_by_index.pop(index)), False
+                        )
+                while pending and idle:
+                    worker, index = idle.pop(), pending[0]
+                    try:
+                        worker.send(index, texts_by_index[index], exts)
+                    except OSError:  # the worker died while idle
+                        worker.stop(kill=True)
+                        idle.append(_Worker(ctx))
+                        continue
+                    pending.popleft()
+                    busy[worker.conn] = worker
+                if idle and not pending and exhausted:
+                    self._checkin(idle)  # let other calls have them meanwhile
+                    idle = []
+                while yielded in done:
+                    yield done.pop(yielded)
+                    yielded += 1
+                if exhausted and yielded == read:
+                    return
+                if not busy:
+                    continue
+                remaining = None
+                if timeout is not None:
+                    deadline = min(w.started for w in busy.values()) + timeout
+                    remaining = max(deadline - time.monotonic(), 0)
+                for conn in ready(list(busy), timeout=remaining):
+                    worker = busy.pop(conn)
+                    try:
+                        ok, html = conn.recv()
+                    except (EOFError, OSError):  # the worker died
+                        idle.append(discard(worker))
+                        continue
+                    text = texts_by_index.pop(worker.index)
+                    done[worker.index] = Rendered(html if ok else fallback(text), ok)
+                    idle.append(worker)
+                if timeout is None:
+                    continue
+                now = time.monotonic()
+                for conn, worker in list(busy.items()):
+                    if now - worker.started >= timeout:
+                        del busy[conn]
+                        idle.append(discard(worker))
+        finally:
+            for worker in busy.values():  # abandoned mid-conversion
+                worker.stop(kill=True)
+            self._checkin(idle, dropped=len(busy))
+
+    def close(self):
+        with self._available:
+            for worker in self._idle:
+                worker.stop()
+            self._started -= len(self._idle)
+            self._idle.clear()
+
+
+@functools.cache
+def _offload_workers() -> MarkdownWorkers:
+    return MarkdownWorkers(settings.FRAGMENTS.get("md_offload_processes", 2))
+
+
+def offload(text: str, exts: Extensions, timeout: float | None) -> Rendered:
+    """Convert a single document in a worker process so that it can't stall the caller
+    beyond `timeout` seconds, plus as much again waiting for a worker if all are busy
+    with the documents of concurrent requests."""
+    results = _offload_workers().map([text], exts, timeout=timeout, wait=timeout)
+    try:
+        return next(results)
+    finally:
+        results.close()
+
+
+def render_many(
+    texts: Iterable[str],
+    exts: Extensions = ("attr_list",),
+    timeout: float | None = None,
+    max_size: int | None = None,
+    processes: int | None = None,
+) -> Iterator[str]:
+    """Bulk counterpart of the `md` filter: convert many documents across worker processes,
+    streaming the html back in input order. Documents found in the `md` cache aren't
+    converted again and successful conversions are added to it, so this can be used to
+    pre-render stored content.
+
+    A document that is longer than `max_size` characters, takes more than `timeout`
+    seconds or fails to convert yields its escaped text instead, see `fallback()`.
+
+    Examples:
+        >>> list(render_many(["# Hi", "*there*"], processes=2))
+        ['<h1>Hi</h1>', '<p><em>there</em></p>']
+        >>> list(render_many(["**long**"], max_size=4))
+        ['<p>**long**</p>']
+
+    Args:
+        texts (Iterable[str]): Markdown documents, possibly a lazy iterable
+        exts (Extensions, optional): Shared by all documents. Defaults to ("attr_list",).
+        timeout (float | None, optional): Seconds allowed per document. Defaults to None.
+        max_size (int | None, optional): Longer documents aren't converted. Defaults to None.
+        processes (int | None, optional): Worker processes. Defaults to the number of CPUs.
+
+    Yields:
+        str: The html of each document, in order
+    """  # noqa: E501
+    exts = normalize_exts(exts)
+    hits: dict[int, str] = {}
+    keys: list[str] = []
+
+    def misses() -> Iterator[str]:
+        for index, text in enumerate(texts):
+            text = str(text)
+            keys.append(key := markdowns.key(text, exts))
+            if (html := markdowns.cached(key)) is not None:
+                hits[index] = html
+            else:
+                yield text
+
+    workers = MarkdownWorkers(processes=processes)
+    try:
+        results = workers.map(misses(), exts, timeout=timeout, max_size=max_size)
+        index = 0
+        for result in results:
+            while index in hits:
+                yield hits.pop(index)
+                index += 1
+            if result.ok:
+                markdowns.store(keys[index], result.html)
+            yield result.html
+            index += 1
+        while index in hits:
+            yield hits.pop(index)
+            index += 1
+    finally:
+        workers.close()
@@ -0,0 +1,53 @@
+import functools
+from collections.abc import Callable
+
+from django.conf import settings
+
+from .icon_registry import IconRegistry, icons
+from .lru import LRUCache
+
+
+def memoize_fragment(
+    size_setting: str, default_size: int = 32, registry: IconRegistry = icons
+) -> Callable:
+    """Cache the output of a fragment built from icons, keyed on its arguments, in an
+    LRU of `FRAGMENTS[size_setting]` entries (default: `default_size`).
+
+    The cache is emptied whenever the `registry` changes. It is bypassed in DEBUG, so that
+    the registry can pick up edited icon files, and for arguments that aren't hashable.
+    Like `functools.lru_cache()`, the wrapper exposes `cache_info()` and `cache_clear()`.
+    The cache is named after the function in `FragmentStats`.
+    """  # noqa: E501
+
+    def decorator(fn: Callable) -> Callable:
+        state: dict = {"cache": None, "generation": registry.generation}
+
+        def get_cache() -> LRUCache:
+            if state["cache"] is None:
+                size = settings.FRAGMENTS.get(size_setting, default_size)
+                state["cache"] = LRUCache(maxsize=size, name=fn.__name__)
+            if state["generation"] != registry.generation:
+                state["cache"].clear()
+                state["generation"] = registry.generation
+            return state["cache"]
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if settings.DEBUG:
+                return fn(*args, **kwargs)
+            try:
+                key = (args, frozenset(kwargs.items()))
+                hash(key)
+            except TypeError:
+                return fn(*args, **kwargs)
+            cache = get_cache()
+            if (result := cache.get(key)) is None:
+                result = fn(*args, **kwargs)
+                cache.set(key, result)
+            return result
+
+        wrapper.cache_info = lambda: get_cache().cache_info()
+        wrapper.cache_clear = lambda: get_cache().clear()
+        return wrapper
+
+    return decorator
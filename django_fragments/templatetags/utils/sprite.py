@@ -0,0 +1,68 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from django.template import Context
+
+from .wrap_svg import SvgMarkup
+
+SPRITE_KEY = "django_fragments.sprite"
+
+
+class SpriteSheet:
+    """The icons referenced through `<use>` while rendering a single template, each to be
+    emitted as a `<symbol>` exactly once by `{% icon_sprite %}`.
+
+    Examples:
+        >>> sheet = SpriteSheet()
+        >>> svg = SvgMarkup('<svg viewBox="0 0 20 20"><path d="M6"/></svg>')
+        >>> sheet.use("heroicons-x", svg)
+        'heroicons-x'
+        >>> sheet.use("heroicons-x", svg)
+        'heroicons-x'
+        >>> sheet.render()
+        '<svg aria-hidden="true" style="display: none" xmlns="http://www.w3.org/2000/svg"><symbol id="heroicons-x" viewbox="0 0 20 20"><path d="M6"></path></symbol></svg>'
+        >>> sheet.render()  # already emitted
+        ''
+    """  # noqa: E501
+
+    def __init__(self):
+        self.used: dict[str, SvgMarkup] = {}
+        self.emitted: set[str] = set()
+        self._recorders: list[dict[str, SvgMarkup]] = []
+
+    def use(self, id: str, svg: SvgMarkup) -> str:
+        self.used.setdefault(id, svg)
+        for recorded in self._recorders:
+            recorded.setdefault(id, svg)
+        return id
+
+    @contextmanager
+    def recording(self) -> Iterator[dict[str, SvgMarkup]]:
+        """Also collect the icons used within the block into the dict yielded, e.g. to
+        `use()` them again when the output of the block is served from a cache."""
+        recorded: dict[str, SvgMarkup] = {}
+        self._recorders.append(recorded)
+        try:
+            yield recorded
+        finally:
+            self._recorders.remove(recorded)
+
+    def render(self) -> str:
+        pending = {k: v for k, v in self.used.items() if k not in self.emitted}
+        if not pending:
+            return ""
+        self.emitted.update(pending)
+        symbols = "".join(svg.symbol(k) for k, svg in pending.items())
+        return (
+            '<svg aria-hidden="true" style="display: none"'
+            f' xmlns="http://www.w3.org/2000/svg">{symbols}</svg>'
+        )
+
+    @classmethod
+    def from_context(cls, context: Context) -> "SpriteSheet":
+        """The sheet shared by every template (including `{% include %}`'d ones) of the
+        render that `context` belongs to."""
+        root = context.render_context.dicts[0]
+        if SPRITE_KEY not in root:
+            root[SPRITE_KEY] = cls()
+        return root[SPRITE_KEY]
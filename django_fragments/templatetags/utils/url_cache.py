@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import get_script_prefix, get_urlconf, reverse
+from django.utils.functional import cached_property
+from django.utils.translation import get_language
+
+from .lru import CacheInfo, LRUCache
+
+
+class ReverseCache:
+    """`django.urls.reverse()` of argument-less url names, memoized in an LRU of
+    `FRAGMENTS["urls_cache_size"]` entries (default: 256).
+
+    The key includes everything else the result depends on: the urlconf of the current
+    thread, the script prefix and the active language (for `i18n_patterns`). The cache
+    is emptied when `ROOT_URLCONF` changes, e.g. through `override_settings`.
+    """
+
+    @cached_property
+    def _cache(self) -> LRUCache:
+        return LRUCache(
+            maxsize=settings.FRAGMENTS.get("urls_cache_size", 256), name="urls"
+        )
+
+    def reverse(self, name: str) -> str:
+        key = (get_urlconf(), get_script_prefix(), get_language(), name)
+        if (url := self._cache.get(key)) is None:
+            url = reverse(name)
+            self._cache.set(key, url)
+        return url
+
+    def cache_info(self) -> CacheInfo:
+        return self._cache.cache_info()
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+urls = ReverseCache()
+
+
+@receiver(setting_changed)
+def clear_on_urlconf_change(*, setting, **kwargs):
+    if setting == "ROOT_URLCONF":
+        urls.clear()
@@ -1,9 +1,249 @@
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
 
-from .filter_attrs import filter_attrs
+VOID_TAGS = frozenset(
+    "area base br col embed hr img input keygen link menuitem meta param source track"
+    " wbr basefont bgsound command frame image isindex nextid spacer".split()
+)
+LIST_ATTRS = {
+    "*": ("class", "accesskey", "dropzone"),
+    "a": ("rel", "rev"),
+    "link": ("rel", "rev"),
+    "area": ("rel",),
+    "td": ("headers",),
+    "th": ("headers",),
+    "form": ("accept-charset",),
+    "object": ("archive",),
+    "icon": ("sizes",),
+    "iframe": ("sandbox",),
+    "output": ("for",),
+}
+PARENT_TAGS = ("button", "a", "span", "div")
+SYMBOL_ATTRS = ("viewbox", "preserveaspectratio")
 
 
-def wrap_svg(html_markup: str, css: str | None = None, **kwargs) -> BeautifulSoup:
+def escape_text(value: str) -> str:
+    if "&" in value or "<" in value or ">" in value:
+        return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return value
+
+
+def quote_attr(value) -> str:
+    """Escape and quote an attribute value, preferring single quotes when the value
+    itself contains a double quote.
+
+    Examples:
+        >>> quote_attr("w-5 h-5")
+        '"w-5 h-5"'
+        >>> quote_attr('say "hi" & <go>')
+        '\\'say "hi" &amp; &lt;go&gt;\\''
+        >>> quote_attr(''' it's "both" ''')
+        '" it\\'s &quot;both&quot; "'
+    """
+    value = escape_text(value if isinstance(value, str) else str(value))
+    if '"' not in value:
+        return f'"{value}"'
+    if "'" not in value:
+        return f"'{value}'"
+    return '"' + value.replace('"', "&quot;") + '"'
+
+
+def render_attr(k: str, v) -> str:
+    return k if v is None else f"{k}={quote_attr(v)}"
+
+
+def start_tag(name: str, attrs: dict) -> str:
+    """Opening tag with attributes sorted by name; a `None` value leaves a bare attribute."""  # noqa: E501
+    return "".join(
+        [f"<{name}", *(f" {render_attr(k, attrs[k])}" for k in sorted(attrs)), ">"]
+    )
+
+
+class _Normalizer(HTMLParser):
+    """Serialize markup into a canonical form (lowercased and sorted attributes,
+    explicit closing tags, collapsed whitespace-only text) while noting where the
+    first `<svg>` element begins and ends."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out: list[str] = []
+        self.stack: list[str] = []
+        self.data: list[str] = []
+        self.svg_attrs: dict | None = None
+        self.svg_start = self.svg_body = self.svg_end = -1
+
+    def flush(self):
+        if not self.data:
+            return
+        text = "".join(self.data)
+        self.data.clear()
+        if not text.strip(" \n\t\f\r") and not {"pre", "textarea"} & set(self.stack):
+            text = "\n" if "\n" in text else " "
+        elif not self.stack or self.stack[-1] not in ("script", "style"):
+            text = escape_text(text)
+        self.out.append(text)
+
+    def handle_data(self, data):
+        self.data.append(data)
+
+    def handle_starttag(self, tag, attrs):
+        self.flush()
+        listed = LIST_ATTRS["*"] + LIST_ATTRS.get(tag, ())
+        values = {
+            k: (" ".join(v.split()) if k in listed else v) if v is not None else ""
+            for k, v in attrs
+        }
+        if tag == "svg" and self.svg_attrs is None:
+            self.svg_attrs, self.svg_start = values, len(self.out)
+            self.svg_body = self.svg_start + 1
+        if tag in VOID_TAGS:
+            self.out.append(start_tag(tag, values)[:-1] + "/>")
+            return
+        self.out.append(start_tag(tag, values))
+        self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self.flush()
+        if tag not in self.stack:
+            return
+        while self.stack:
+            closed = self.stack.pop()
+            self.out.append(f"</{closed}>")
+            if closed == "svg" and self.svg_end < 0 and self.svg_start >= 0:
+                if "svg" not in self.stack:
+                    self.svg_end = len(self.out)
+            if closed == tag:
+                break
+
+    def handle_comment(self, data):
+        self.flush()
+        self.out.append(f"<!--{data}-->")
+
+    def handle_decl(self, decl):
+        self.flush()
+        self.out.append(f"<!DOCTYPE {decl.removeprefix('DOCTYPE ')}>\n")
+
+    def unknown_decl(self, data):
+        self.flush()
+        if data.startswith("CDATA["):
+            self.out.append(f"<![CDATA[{data.removeprefix('CDATA[')}]]>")
+        else:
+            self.out.append(f"<![{data}]>")
+
+    def handle_pi(self, data):
+        self.flush()
+        self.out.append(f"<?{data}>")
+
+    def close(self):
+        super().close()
+        self.flush()
+        if self.stack:
+            self.handle_endtag(self.stack[0])
+
+
+class SvgMarkup:
+    """An `<svg>` fragment normalized once, split around the opening tag of its first
+    `<svg>` so that each decoration is a matter of string concatenation.
+
+    Examples:
+        >>> svg = SvgMarkup('<svg viewBox="0 0 20 20" class="w-5  h-5"><path d="M6"/></svg>')
+        >>> svg.attrs
+        {'viewbox': '0 0 20 20', 'class': 'w-5 h-5'}
+        >>> svg.body
+        '<path d="M6"></path></svg>'
+        >>> str(svg)
+        '<svg class="w-5 h-5" viewbox="0 0 20 20"><path d="M6"></path></svg>'
+        >>> svg.render(use="heroicons-x")
+        '<svg class="w-5 h-5" viewbox="0 0 20 20"><use href="#heroicons-x"></use></svg>'
+        >>> svg.symbol("heroicons-x")
+        '<symbol id="heroicons-x" viewbox="0 0 20 20"><path d="M6"></path></symbol>'
+    """  # noqa: E501
+
+    __slots__ = (
+        "head",
+        "attrs",
+        "rendered_attrs",
+        "body",
+        "tail",
+        "opening",
+        "element",
+    )
+
+    def __init__(self, html_markup: str):
+        parser = _Normalizer()
+        parser.feed(html_markup)
+        parser.close()
+        if parser.svg_attrs is None:
+            raise ValueError("Markup does not contain an <svg> element.")
+        out = parser.out
+        end = parser.svg_end if parser.svg_end >= 0 else len(out)
+        self.head = "".join(out[: parser.svg_start])
+        self.attrs = parser.svg_attrs
+        self.body = "".join(out[parser.svg_body : end])
+        self.tail = "".join(out[end:])
+        self.rendered_attrs = {k: render_attr(k, v) for k, v in self.attrs.items()}
+        self.opening = start_tag("svg", self.attrs)
+        self.element = self.opening + self.body
+
+    def __str__(self) -> str:
+        return self.head + self.element + self.tail
+
+    def symbol(self, id: str) -> str:
+        """The `<svg>` contents as a `<symbol>` for a sprite sheet, keeping the
+        attributes that determine how the paths are scaled."""
+        attrs = {k: v for k, v in self.attrs.items() if k in SYMBOL_ATTRS}
+        inner = self.body.removesuffix("</svg>")
+        return f"{start_tag('symbol', attrs | {'id': id})}{inner}</symbol>"
+
+    def render(self, css: str | None = None, use: str | None = None, **kwargs) -> str:
+        """See `wrap_svg()`. Sorts the kwargs into their `aria_`, `parent_`, `pre_`
+        and `post_` groups in a single pass, mirroring `filter_attrs()`.
+
+        With `use`, the contents of the `<svg>` are replaced by a reference to the
+        `<symbol>` of that id, see `symbol()`."""
+        aria: dict = {}
+        groups: dict[str, dict] = {"parent": {}, "pre": {}, "post": {}}
+        for k, v in kwargs.items():
+            group, _, attr = k.partition("_")
+            if not attr:
+                continue
+            if group == "aria":
+                aria[k.replace("_", "-")] = v
+            elif group in groups:
+                groups[group][attr] = v
+
+        body = f"<use href={quote_attr('#' + use)}></use></svg>" if use else self.body
+        svg = self.opening + body
+        if css or aria:
+            rendered = self.rendered_attrs.copy()
+            for k, v in aria.items():
+                rendered[k] = render_attr(k, v)
+            if css:
+                rendered["class"] = render_attr("class", css)
+            svg = "".join(
+                ["<svg", *(f" {rendered[k]}" for k in sorted(rendered)), ">", body]
+            )
+
+        pre, post, parent = groups["pre"], groups["post"], groups["parent"]
+        parent_tag = parent.pop("tag", None)
+        if parent_tag not in PARENT_TAGS:
+            parent_tag = "span" if parent else None
+
+        if left := pre.pop("text", None):  # <span>, left of <svg>
+            svg = f"{start_tag('span', pre)}{escape_text(str(left))}</span>{svg}"
+        elif right := post.pop("text", None):  # <span>, right of <svg>
+            svg = f"{svg}{start_tag('span', post)}{escape_text(str(right))}</span>"
+
+        if parent_tag:
+            svg = f"{start_tag(parent_tag, parent)}{svg}</{parent_tag}>"
+        return self.head + svg + self.tail
+
+
+def wrap_svg(html_markup: str | SvgMarkup, css: str | None = None, **kwargs) -> str:
     """Supplement html fragment of `<svg>` icon with css classes and attributes, include parent/sibling `<span>`s when parameters dictate.
 
     The following kwargs: `pre_`, `post_`, and `parent_` args are respected.
@@ -31,63 +271,29 @@ def wrap_svg(html_markup: str, css: str | None = None, **kwargs) -> BeautifulSou
     <span class='the-value-of-parent_class' title='the-value-of-parent_title'><svg></svg></span>
     ```
 
+    The markup is normalized (lowercased and sorted attributes, explicit closing tags) by `SvgMarkup`;
+    pass a previously built `SvgMarkup` to skip that step entirely.
+
     Examples:
         >>> markup = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 20 20" fill="currentColor" class="w-5 h-5"><path d="M6.28 5.22a.75.75 0 00-1.06 1.06L8.94 10l-3.72 3.72a.75.75 0 101.06 1.06L10 11.06l3.72 3.72a.75.75 0 101.06-1.06L11.06 10l3.72-3.72a.75.75 0 00-1.06-1.06L10 8.94 6.28 5.22z" /></svg>'
         >>> res = wrap_svg(html_markup=markup, pre_text="Close menu", pre_class="sr-only", aria_hidden="true")
-        >>> len(res.contents) == 2
-        True
-        >>> res.contents[0]
-        <span class="sr-only">Close menu</span>
-        >>> res.contents[1].attrs == {'xmlns': 'http://www.w3.org/2000/svg', 'viewbox': '0 0 20 20', 'fill': 'currentColor', 'class': ['w-5', 'h-5'], 'aria-hidden': 'true'}
+        >>> res[: res.index("<path")]
+        '<span class="sr-only">Close menu</span><svg aria-hidden="true" class="w-5 h-5" fill="currentColor" viewbox="0 0 20 20" xmlns="http://www.w3.org/2000/svg">'
+        >>> res.endswith('</path></svg>')
         True
         >>> parented = wrap_svg(html_markup=markup, parent_tag="button", pre_text="Close menu", pre_class="sr-only", aria_hidden="true")
-        >>> elements = list(parented.children)
-        >>> elements[0].name == 'button'
+        >>> parented.startswith('<button>') and parented.endswith('</button>')
         True
-        >>> list(elements[0].children)
-        [<span class="sr-only">Close menu</span>, <svg aria-hidden="true" class="w-5 h-5" fill="currentColor" viewbox="0 0 20 20" xmlns="http://www.w3.org/2000/svg"><path d="M6.28 5.22a.75.75 0 00-1.06 1.06L8.94 10l-3.72 3.72a.75.75 0 101.06 1.06L10 11.06l3.72 3.72a.75.75 0 101.06-1.06L11.06 10l3.72-3.72a.75.75 0 00-1.06-1.06L10 8.94 6.28 5.22z"></path></svg>]
+        >>> parented.removeprefix('<button>').removesuffix('</button>')
+        '<span class="sr-only">Close menu</span><svg aria-hidden="true" class="w-5 h-5" fill="currentColor" viewbox="0 0 20 20" xmlns="http://www.w3.org/2000/svg"><path d="M6.28 5.22a.75.75 0 00-1.06 1.06L8.94 10l-3.72 3.72a.75.75 0 101.06 1.06L10 11.06l3.72 3.72a.75.75 0 101.06-1.06L11.06 10l3.72-3.72a.75.75 0 00-1.06-1.06L10 8.94 6.28 5.22z"></path></svg>'
 
     Args:
-        html_markup (str): The template that contains the `<svg>` tag converted into its html string format.
+        html_markup (str | SvgMarkup): The template that contains the `<svg>` tag converted into its html string format, or its pre-built `SvgMarkup`.
         css (str, optional): Previously defined CSS to add to the `<svg>` icon. Defaults to None.
 
     Returns:
-        SafeString: Small HTML fragment visually representing an svg icon.
+        str: Small HTML fragment visually representing an svg icon.
     """  # noqa: E501
-
-    soup = BeautifulSoup(html_markup, "html.parser")
-    icon = soup("svg")[0]
-    if css:
-        icon["class"] = css
-    if aria_attrs := filter_attrs("aria", kwargs):
-        for k, v in aria_attrs.items():
-            icon[k] = v
-
-    parent_tag = None
-    if tagname := kwargs.pop("parent_tag", None):
-        if tagname in ["button", "a", "span", "div"]:
-            parent_tag = soup.new_tag(tagname)
-
-    if parent_attrs := filter_attrs("parent", kwargs, unprefix=True):
-        if not parent_tag:
-            parent_tag = soup.new_tag("span")
-        for k, v in parent_attrs.items():
-            parent_tag[k] = v
-    if parent_tag:
-        icon.wrap(parent_tag)
-
-    if left := kwargs.pop("pre_text", None):  # <span>, left of <svg>
-        pre_span = soup.new_tag("span")
-        pre_span.string = left
-        if pre_attrs := filter_attrs("pre", kwargs, unprefix=True):
-            for k, v in pre_attrs.items():
-                pre_span[k] = v
-        icon.insert_before(pre_span)
-    elif right := kwargs.pop("post_text", None):  # <span>, right of <svg>
-        post_span = soup.new_tag("span")
-        post_span.string = right
-        if post_attrs := filter_attrs("post", kwargs, unprefix=True):
-            for k, v in post_attrs.items():
-                post_span[k] = v
-        icon.insert_after(post_span)
-    return soup
+    if not isinstance(html_markup, SvgMarkup):
+        html_markup = SvgMarkup(html_markup)
+    return html_markup.render(css=css, **kwargs)
@@ -1,7 +1,57 @@
+import asyncio
+import functools
+import gzip
+import itertools
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import timeit
+import warnings
+
 import pytest
-from django.template import Context, Template
+from django import forms
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.base import Message
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.template import (
+    Context,
+    Engine,
+    Template,
+    TemplateDoesNotExist,
+    TemplateSyntaxError,
+)
+from django.template.loader import get_template
+from django.views.generic import CreateView
 
 from .forms import ContactForm
+from .middleware import HtmxMiddleware
+from .mixins import AsyncInlineValidationMixin, validate_field
+from .templatetags import fragments, og
+from .templatetags.fragments import hform, hput, themer
+from .templatetags.utils import (
+    IconRegistry,
+    MarkdownRenderer,
+    MarkdownWorkers,
+    collect,
+    fragment_caches,
+    fragments_measured,
+    icons,
+    markdowns,
+    minify,
+    render_blocks,
+    render_errors,
+    render_many,
+    render_widget,
+    scripts,
+    urls,
+)
+from .templatetags.utils.form_markup import DJANGO_TEMPLATES
+from .utils import md_preview, render_fragment
+from .views import AboutPage, ContactFormView, HomePage, send_msg
 
 icon_test = (
     '<svg class="test" fill="currentColor" viewbox="0 0 20 20"'
@@ -56,6 +106,91 @@ def test_icon_fragments(template, html):
     assert Template(template).render(context=Context()) == html
 
 
+def test_icon_sprite_mode():
+    template = (
+        "{% load fragments %}{% for i in items %}"
+        '{% icon name="x_mark_mini" css="test" pre_text="Close" sprite=True %}'
+        "{% endfor %}{% icon_sprite %}{% icon_sprite %}"
+    )
+    html = Template(template).render(context=Context({"items": range(3)}))
+    use = (
+        '<span>Close</span><svg class="test" fill="currentColor" viewbox="0 0 20 20"'
+        ' xmlns="http://www.w3.org/2000/svg"><use'
+        ' href="#heroicons-x_mark_mini"></use></svg>'
+    )
+    assert html.startswith(use * 3)
+    assert html.count("<symbol") == 1
+    assert html.count('<path d="M6.28 5.22') == 1
+
+
+def test_themer_is_memoized_until_icons_change(settings):
+    settings.DEBUG = False
+    themer.cache_clear()
+    first = themer(btn_kls="btn", icon1_css="light")
+    assert themer(icon1_css="light", btn_kls="btn") is first
+    assert themer.cache_info().hits == 1
+    icons.clear()
+    assert themer(btn_kls="btn", icon1_css="light") is not first
+    assert themer(btn_kls="btn", icon1_css="light") == first
+
+
+def test_icon_registry_reloads_changed_file_in_debug(settings, tmp_path):
+    settings.DEBUG = True
+    svg = tmp_path / "test_dot.html"
+    svg.write_text('<svg class="a"></svg>')
+    (tmp_path / "test_ring.html").write_text('<svg class="r"></svg>')
+    registry = IconRegistry(maxsize=1)
+    assert str(registry.get("dot", "test", tmp_path).svg) == '<svg class="a"></svg>'
+    assert registry.get("dot", "test", tmp_path) is registry.get(
+        "dot", "test", tmp_path
+    )
+    svg.write_text('<svg class="b"></svg>')
+    os.utime(svg, ns=(svg.stat().st_atime_ns, svg.stat().st_mtime_ns + 10**9))
+    assert str(registry.get("dot", "test", tmp_path).svg) == '<svg class="b"></svg>'
+    registry.get("ring", "test", tmp_path)
+    info = registry.cache_info()
+    assert (info.hits, info.misses, info.evictions, info.currsize) == (3, 2, 1, 1)
+
+
+def test_icon_manifest_warms_registry(settings, tmp_path):
+    target = tmp_path / "icons.json"
+    call_command("build_icon_manifest", output=target)
+    registry = IconRegistry()
+    assert registry.load_manifest(target) == 3
+    entry = registry.get("x_mark_mini", "heroicons", settings.FRAGMENTS["icons_path"])
+    assert entry.svg.attrs["viewbox"] == "0 0 20 20"
+    info = registry.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 0, 3)
+
+
+def test_fragments_js_defers_the_bundle_once_built(settings, tmp_path):
+    settings.DEBUG = True  # the bundle is looked up on each render
+    settings.STATICFILES_DIRS = [tmp_path]
+    page = Template("{% load fragments %}{% fragments_js %}")
+    html = page.render(Context())
+    assert html.count("<script defer src=") == 3 and "doDropMenu.js" in html
+    call_command("build_fragments_js")  # into the first of STATICFILES_DIRS
+    target = tmp_path / scripts.name()
+    assert (
+        page.render(Context())
+        == f'<script defer src="/static/{scripts.name()}"></script>'
+    )
+    source = target.read_text()
+    assert "/**" not in source and "function doMenu(id) {" in source
+    assert gzip.decompress(target.with_suffix(".js.gz").read_bytes()).decode() == source
+
+
+def test_build_fragments_js_writes_to_the_project_static_files(settings, tmp_path):
+    settings.DEBUG = True
+    settings.STATICFILES_DIRS, settings.STATIC_ROOT = [], None
+    with pytest.raises(CommandError, match="STATICFILES_DIRS or STATIC_ROOT"):
+        call_command("build_fragments_js")
+    settings.STATIC_ROOT = tmp_path
+    call_command("build_fragments_js")
+    assert (tmp_path / scripts.name()).exists()
+    assert scripts.reference() == (scripts.name(),)
+
+
 @pytest.mark.parametrize(
     "template, html",
     [
@@ -68,12 +203,48 @@ def test_icon_fragments(template, html):
             </p>{% endwhitespaceless %}""",
             '<p class="test test2 test3"><a href="foo/">Foo</a></p>',
         ),
+        (
+            """{% load fragments %}{% whitespaceless %}
+            <div>
+                <pre>  keep
+                  this </pre>
+                <textarea name="t">  as  is </textarea>
+            </div>{% endwhitespaceless %}""",
+            (
+                '<div><pre>  keep\n                  this </pre><textarea name="t">  as'
+                "  is </textarea></div>"
+            ),
+        ),
+        (
+            """{% load fragments %}{% whitespaceless %}
+            <pre-x>  custom  </pre-x> <pre>  a  </pre> <script>  unclosed{% endwhitespaceless %}""",
+            "<pre-x>custom</pre-x><pre>  a  </pre><script>  unclosed",
+        ),
     ],  # noqa: E501; also from [Will Gordon](https://stackoverflow.com/users/6758654/will-gordon). See [answer](https://stackoverflow.com/a/72942459)
 )
 def test_whitespace(template, html):
     assert Template(template).render(context=Context()) == html
 
 
+def test_minify_is_linear_in_unclosed_preserved_tags():
+    def seconds(n: int) -> float:
+        html = "<pre a>x <script>y " * n
+        return min(timeit.repeat(lambda: minify(html), number=1, repeat=3))
+
+    assert seconds(16000) < seconds(2000) * 16  # quadratic would be x64
+
+
+def test_whitespaceless_minifies_dynamic_output_at_the_seams():
+    template = Template("""{% load fragments %}{% whitespaceless %}
+        <p class="{{ css }}  ">  {{ name }}
+            <b>{{ greeting }}</b>  {% if name %}  !{% endif %}
+        </p>
+        <pre>{{ code }}</pre>{% endwhitespaceless %}""")
+    context = {"css": " a  b", "name": "x", "greeting": " hi ", "code": "  a\n  b"}
+    html = template.render(Context(context))
+    assert html == '<p class="a b">x<b>hi</b>!</p><pre>  a\n  b</pre>'
+
+
 def test_boundfield_with_inline_validation():
     template = """{% load fragments %}{% spaceless %}{% hput form.email validate="/this-is-an-endpoint" %}{% endspaceless %}"""
     context = Context({"form": ContactForm()})
@@ -85,3 +256,566 @@ def test_boundfield_with_inline_validation():
         ' name="email" required id="id_email"><small>Testable form</small></div>'
     )
     assert Template(template).render(context=context) == html
+
+
+def test_htmx_csrf():
+    template = "{% load fragments %}<body {% htmx_csrf %}>"
+    html = Template(template).render(context=Context({"csrf_token": "a1b2"}))
+    assert html == """<body hx-headers='{"X-CSRFToken": "a1b2"}'>"""
+
+
+def test_md_pools_engines_and_caches_output(settings, monkeypatch):
+    settings.FRAGMENTS = settings.FRAGMENTS | {"md_cache": "default"}
+    renderer = MarkdownRenderer()
+    text = "[docs][ref]{: .x }\n\n[ref]: https://x.dev"
+    html = renderer.render(text, "attr_list")
+    assert html == '<p><a class="x" href="https://x.dev">docs</a></p>'
+    assert "href" not in renderer.render("[docs][ref]", "attr_list")  # engine reset
+    assert renderer.render(text, ["attr_list"]) is html
+    renderer.clear()
+    monkeypatch.setattr(renderer.pool, "convert", None)  # served by the django cache
+    assert renderer.render(text, "attr_list") == html
+
+
+def test_md_workers_stream_in_order_and_fall_back(settings):
+    settings.FRAGMENTS = settings.FRAGMENTS | {"md_offload_size": 10}
+    workers = MarkdownWorkers(processes=2)
+    try:
+        texts = (f"*{i}*" for i in range(20))
+        html = [r.html for r in workers.map(texts)]
+        assert html == [f"<p><em>{i}</em></p>" for i in range(20)]
+        slow = "[a](" * 2000  # quadratic in the link pattern
+        results = list(workers.map(["# A", slow, "# B"], timeout=0.05))
+        assert [r.ok for r in results] == [True, False, True]
+        assert results[1].html.startswith("<p>[a](")
+    finally:
+        workers.close()
+    workers = MarkdownWorkers(processes=1)
+    try:
+        list(workers.map(["# A"]))
+        threading.Timer(0.2, workers._idle[0].process.kill).start()
+        results = list(workers.map(["# A", slow * 4]))
+        assert [r.ok for r in results] == [True, False]  # died mid-conversion
+        workers._idle[0].process.kill()
+        workers._idle[0].process.join()
+        assert [r.ok for r in workers.map(["# B"])] == [True]  # died while idle
+    finally:
+        workers.close()
+    assert list(render_many(["<b>&</b>"], max_size=4)) == [
+        "<p>&lt;b&gt;&amp;&lt;/b&gt;</p>"
+    ]
+    assert (
+        MarkdownRenderer().render("offloaded **bold**")
+        == "<p>offloaded <strong>bold</strong></p>"
+    )
+
+
+def test_md_workers_are_shared_by_concurrent_calls():
+    workers, slow, elapsed = MarkdownWorkers(processes=2), "[a](" * 8000, []
+
+    def convert():
+        start = time.monotonic()
+        list(workers.map([slow], timeout=0.3, wait=0.3))
+        elapsed.append(time.monotonic() - start)
+
+    try:
+        threads = [threading.Thread(target=convert) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        workers.close()
+    assert len(elapsed) == 4 and max(elapsed) < 0.9  # not 4 x 0.3s in turn
+
+
+def test_md_workers_start_afresh_while_other_threads_hold_locks(monkeypatch):
+    held, done = threading.Lock(), threading.Event()
+
+    def busy():
+        with held:
+            done.wait()
+
+    # a forked worker would inherit both the patch and the lock, held for good
+    monkeypatch.setattr(
+        type(markdowns.pool), "convert", lambda self, text, exts: held.acquire()
+    )
+    thread = threading.Thread(target=busy)
+    thread.start()
+    workers = MarkdownWorkers(processes=1)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)  # 3.12+ on fork
+            results = list(workers.map(["# A"], timeout=5))
+    finally:
+        workers.close()
+        done.set()
+        thread.join()
+    assert results == [("<h1>A</h1>", True)]
+
+
+def test_md_preview_swaps_only_changed_blocks(rf, monkeypatch):
+    text = "# Title\n\nSee [docs][1]\n\n[1]: https://x.dev"
+    page = Template("{% load fragments %}{% md_preview text %}")
+    html = page.render(Context({"text": text}))
+    hashes = re.findall(r'data-md-hash="(\w+)"', html)
+    assert len(hashes) == 3 and '<a href="https://x.dev">docs</a>' in html
+    converted = []
+    convert = markdowns.pool.convert
+    monkeypatch.setattr(
+        markdowns.pool, "convert", lambda t, e: converted.append(t) or convert(t, e)
+    )
+    edited = text.replace("https://x.dev", "https://y.dev") + "\n\nMore"
+    request = rf.post("/", {"md_hashes": ",".join(hashes)}, HTTP_HX_REQUEST="true")
+    body = md_preview(request, edited).content.decode()
+    assert "md-preview-0" not in body  # the title is unchanged
+    assert '<div id="md-preview-1" data-md-hash=' in body and "https://y.dev" in body
+    assert 'hx-swap-oob="beforeend:#md-preview"><div id="md-preview-3"' in body
+    assert not any("Title" in t for t in converted)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "# Title\n\nSome *text*\n\n- a\n\n- b\n\n```\nx\n\ny\n```\n\n> q\n\n> r",
+        "<div>\n\nraw\n\n</div>\n\n    indented\n\n    code\n\nafter",
+        "See [docs][1]\n\nPlain\n\n[1]: https://x.dev",
+        "<!-- c\n\nstill -->\n\nafter",
+        "para\n<!-- c -->\n<!-- d\n\n# not a title\n\n-->\n\nafter <!-- e\n\nf -->",
+    ],
+)
+def test_md_blocks_render_as_the_whole_document(text):
+    import markdown
+
+    whole = markdown.markdown(text, extensions=["attr_list"])
+    blocks = "\n".join(block.html for block in render_blocks(text))
+    assert blocks.split() == whole.split()
+
+
+def test_navmenu_marks_current_path_with_cached_urls(rf, settings):
+    urls.clear()
+    template = Template(
+        "{% load fragments %}"
+        "{% navmenu 'test_fragments:test_page|Home' 'test_fragments:about' css='x' %}"
+    )
+    html = template.render(Context({"request": rf.get("/about/")}))
+    assert (
+        html
+        == "<li><a href='/' class='x'>Home</a></li><li><a href='/about/' class='x'"
+        " aria-current=page>test_fragments:about</a></li>"
+    )
+    template.render(Context({"request": rf.get("/")}))
+    assert urls.cache_info().hits == 2
+    settings.ROOT_URLCONF = "django_fragments.urls"  # emits setting_changed
+    assert urls.cache_info().currsize == 0
+
+
+def test_og_meta_and_memoized_site_name(rf, monkeypatch):
+    request = rf.get("/")
+    template = Template(
+        "{% load fragments %}{% og_meta 'Post' desc='About' img='/a.png' alt='A'"
+        " request=request %}"
+    )
+    html = template.render(Context({"request": request}))
+    assert html.startswith(
+        '<title>Post - testserver</title><meta property="og:title" content="Post -'
+        ' testserver"/>'
+    )
+    assert '<meta name="twitter:description" content="About"/>' in html
+    assert html.endswith('<meta name="twitter:image:alt" content="A"/>')
+
+    lookups = []
+    monkeypatch.setattr(og.apps, "is_installed", lambda app: True)
+    monkeypatch.setattr(
+        og,
+        "get_current_site",
+        lambda r: lookups.append(r) or type("S", (), {"name": "S"}),
+    )
+    og.clear_site_names()
+    assert og.og_title("A", request) == og.og_title("A", request)
+    assert len(lookups) == 1
+    og.clear_site_names()  # connected to Site post_save and post_delete
+    og.og_title("A", request)
+    assert len(lookups) == 2
+
+
+def test_hform_matches_hput_per_field():
+    form = ContactForm(data={"email": "not-an-email"})
+    per_field = "".join(hput(bound, validate="/v") for bound in form)
+    assert hform(form, validate="/v") == per_field
+    assert 'data-invalid=true class="h" data-widget="email"' in per_field
+
+    class Hidden(forms.Form):
+        name = forms.CharField()
+        token = forms.CharField(widget=forms.HiddenInput)
+
+    formset = forms.formset_factory(Hidden, extra=2)(prefix="h")
+    html = hform(formset)
+    assert html.count('data-widget="text"') == 2
+    assert html.count('type="hidden" name="h-0-token"') == 1
+    assert 'name="h-TOTAL_FORMS" value="2"' in html
+    bound = Hidden(data={"name": "x"})
+    assert "(Hidden field token) This field is required." in hform(bound)
+
+
+class Inputs(forms.Form):
+    text = forms.CharField(label="A <b>", max_length=5, initial='a "b" <c>')
+    number = forms.DecimalField(localize=True, initial=1234.5)
+    when = forms.DateTimeField(
+        widget=forms.DateTimeInput(attrs={"a": True, "b": False})
+    )
+    agree = forms.BooleanField(initial=True)
+    secret = forms.CharField(widget=forms.PasswordInput(render_value=True))
+    shown = forms.CharField(show_hidden_initial=True, initial="i")
+    note = forms.CharField(widget=forms.Textarea)
+
+
+class InputOverridden(forms.renderers.DjangoTemplates):
+    @functools.cached_property
+    def engine(self):
+        loaders = [
+            (
+                "django.template.loaders.locmem.Loader",
+                {"django/forms/widgets/input.html": "<input>!"},
+            ),
+            "django.template.loaders.filesystem.Loader",
+        ]
+        return self.backend(
+            {"APP_DIRS": False, "DIRS": [DJANGO_TEMPLATES], "NAME": "djangoforms"}
+            | {"OPTIONS": {"loaders": loaders}}
+        )
+
+
+@pytest.mark.parametrize(
+    "form",
+    [
+        Inputs(),
+        Inputs(data={"text": "too long", "secret": "s", "when": "x"}, prefix="p"),
+        Inputs(auto_id=False),
+        Inputs(renderer=InputOverridden()),
+    ],
+)
+def test_form_markup_matches_the_renderer(form):
+    form.is_valid()
+    for bound in form:
+        assert render_widget(bound) == str(bound)
+        assert render_errors(bound.errors) == str(bound.errors)
+    assert render_errors(form.non_field_errors()) == str(form.non_field_errors())
+
+
+def test_form_markup_of_an_overridden_template_is_rendered():
+    form = Inputs(renderer=InputOverridden())
+    assert render_widget(form["text"]) == "<input>!"
+
+
+def test_inline_validation_returns_only_the_blurred_field(client):
+    data = {"email": "not-an-email", "message": "", "category": "no"}
+    headers = {"HTTP_HX_REQUEST": "true", "HTTP_HX_TRIGGER": "hput_id_email"}
+    response = client.post("/contact/", data, **headers)
+    html = response.content.decode()
+    assert html.startswith('<div id="hput_id_email" hx-select="#hput_id_email"')
+    assert "Enter a valid email address." in html and "id_message" not in html
+    assert 'class="test"' in html and 'class="xx"' in html
+    response = client.post("/contact/", data, HTTP_HX_REQUEST="true")
+    html = response.content.decode()  # anything else is a full post of the form
+    assert "id_message" in html and "Enter a valid email address." in html
+
+
+def test_fragment_response_renders_only_the_fragment_for_htmx(client):
+    data = {"message": "Hi", "tag": "25"}
+    html = client.post("/send_msg/", data, HTTP_HX_REQUEST="true").content.decode()
+    assert html.strip().startswith('<section hx-target="this"')
+    assert "Hi" in html and "<nav" not in html and "<html" not in html
+    html = client.post("/send_msg/", data).content.decode()
+    assert "<html" in html and "<section hx-target" in html
+    html = client.get("/contact/", HTTP_HX_REQUEST="true").content.decode()
+    assert "<html" in html  # a plain TemplateResponse, as the view's get() returns
+    html = client.post("/contact/", {}, HTTP_HX_REQUEST="true").content.decode()
+    assert html.strip().startswith('<form method="post">')
+    assert "csrfmiddlewaretoken" in html  # context processors still run
+
+
+def test_fragment_tag_errors():
+    with pytest.raises(TemplateSyntaxError):
+        Template(
+            "{% load fragments %}{% fragment 'a' %}{% endfragment %}"
+            "{% fragment 'a' %}{% endfragment %}"
+        )
+    with pytest.raises(TemplateDoesNotExist):
+        render_fragment(get_template("home.html"), "missing")
+
+
+def test_fragment_cache_varies_on_values_htmx_and_source(rf):
+    cache.clear()
+    count = itertools.count(1)
+    source = "{% load fragments %}{% fragment_cache 60 'box' who %}{{ n }}{% endfragment_cache %}"  # noqa: E501
+
+    def render(who, src=source, **headers):
+        context = Context({"who": who, "n": lambda: next(count)})
+        context["request"] = rf.get("/", **headers)
+        return Template(src).render(context)
+
+    assert render("a") == render("a") == "1"
+    assert render("b") == "2"
+    assert render("a", HTTP_HX_REQUEST="true", HTTP_HX_TARGET="box") == "3"
+    assert render("a", src=source.replace("{{ n }}", "{{ n }}!")) == "4!"
+    assert render("a") == "1"
+
+
+def test_fragment_cache_key_covers_included_templates():
+    cache.clear()
+    count = itertools.count(1)
+    sources = {
+        "page.html": (
+            "{% load fragments %}{% fragment_cache 60 'inc' %}"
+            "{% include './inc.html' %}{% endfragment_cache %}"
+        ),
+        "inc.html": "{% include name %}",
+        "a.html": "A{{ n }}",
+    }
+
+    def render():
+        loader = ("django.template.loaders.locmem.Loader", sources)
+        engine = Engine(
+            loaders=[loader],
+            libraries={"fragments": "django_fragments.templatetags.fragments"},
+        )
+        context = Context({"name": "a.html", "n": lambda: next(count)})
+        return engine.get_template("page.html").render(context)
+
+    assert render() == render() == "A1"
+    sources["a.html"] = "B{{ n }}"  # edited two includes down
+    assert render() == "B2"
+
+
+def test_fragment_cache_replays_sprite_icons_on_a_hit():
+    cache.clear()
+    page = Template(
+        "{% load fragments %}{% fragment_cache 60 'icons' %}"
+        "{% icon 'x_mark_mini' sprite=True %}{% endfragment_cache %}{% icon_sprite %}"
+    )
+    miss, hit = page.render(Context()), page.render(Context())
+    assert miss == hit and '<use href="#heroicons-x_mark_mini">' in hit
+    assert '<symbol id="heroicons-x_mark_mini"' in hit
+
+
+def test_fragment_cache_serves_stale_while_one_request_refreshes(monkeypatch):
+    cache.clear()
+    key, now = "fragments:cache:test", time.time()
+    assert fragment_caches.get_or_render(key, lambda: "old", 60, stale=30) == "old"
+    monkeypatch.setattr(time, "time", lambda: now + 70)  # stale, not yet evicted
+    cache.add(f"{key}:lock", 1)  # as if another request were refreshing it
+    assert fragment_caches.get_or_render(key, lambda: "new", 60, stale=30) == "old"
+    cache.delete(f"{key}:lock")
+    assert fragment_caches.get_or_render(key, lambda: "new", 60, stale=30) == "new"
+    assert fragment_caches.get_or_render(key, lambda: "newer", 60) == "new"
+
+
+def test_async_fragment_cache_and_warmups(settings, tmp_path):
+    cache.clear()
+    key = "fragments:cache:async"
+
+    async def render():
+        return "<p>async</p>"
+
+    async def run():
+        first = await fragment_caches.aget_or_render(key, render, 60)
+        again = await fragment_caches.aget_or_render(key, lambda: "<p>sync</p>", 60)
+        return first, again
+
+    assert asyncio.run(run()) == ("<p>async</p>", "<p>async</p>")
+    (tmp_path / "test_dot.html").write_text("<svg><circle r='1'/></svg>")
+    generation = icons.generation
+    assert asyncio.run(icons.apreload("test", tmp_path)) == 1
+    assert icons.generation == generation + 1
+    settings.FRAGMENTS = {**settings.FRAGMENTS, "md_cache": None}
+    markdowns.clear()
+    texts = [f"# Title {i}" for i in range(3)]
+    assert asyncio.run(markdowns.awarm(texts)) == 3
+    assert markdowns.cache_info().currsize == 3
+    assert asyncio.run(markdowns.arender("# Title 0")) == "<h1>Title 0</h1>"
+
+
+def test_views_are_async_and_answer_like_the_sync_ones(client):
+    assert asyncio.iscoroutinefunction(send_msg)
+    assert all(v.view_is_async for v in (HomePage, AboutPage, ContactFormView))
+    assert client.get("/send_msg/").status_code == 405
+    assert client.get("/").status_code == client.get("/about/").status_code == 200
+    response = client.post("/contact/", {"email": "a@b.co", "message": "Hi"})
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_form_view_saves_off_the_event_loop(rf):
+    class Signup(AsyncInlineValidationMixin, CreateView):
+        model, fields, success_url = User, ["username"], "/"
+
+    view = Signup.as_view()
+    response = asyncio.run(view(rf.post("/signup/", {"username": "ada"})))
+    assert response.status_code == 302 and User.objects.filter(username="ada").exists()
+
+
+def test_fragment_cache_misses_wait_for_the_request_rendering_it(settings):
+    cache.clear()
+    settings.FRAGMENTS = {**settings.FRAGMENTS, "fragment_cache_wait": 0.3}
+    key = "fragments:cache:cold"
+    cache.add(f"{key}:lock", 1)  # as if another request were rendering it
+    threading.Timer(0.1, cache.set, (key, (None, "theirs"))).start()
+    assert fragment_caches.get_or_render(key, lambda: "mine") == "theirs"
+    cache.delete(key)
+    assert fragment_caches.get_or_render(key, lambda: "mine") == "mine"  # gave up
+    assert cache.get(key) is None  # not stored while the lock is theirs
+    cache.delete(f"{key}:lock")
+    assert fragment_caches.get_or_render(key, lambda: "mine") == "mine"
+    assert cache.get(key)[1] == "mine" and cache.get(f"{key}:lock") is None
+
+
+def test_htmx_middleware_reads_headers_lazily_and_patches_vary(rf, client):
+    request = rf.get("/", HTTP_HX_REQUEST="true", HTTP_HX_TARGET="main")
+    HtmxMiddleware(lambda r: None).process_request(request)
+    assert request.htmx and request.htmx.target == "main"
+    assert not request.htmx.boosted and request.htmx.trigger is None
+    response = client.get("/about/")
+    assert response["Vary"].count("HX-Request") == 1
+    assert "HX-History-Restore-Request" in response["Vary"]
+    headers = {"HTTP_HX_REQUEST": "true", "HTTP_HX_HISTORY_RESTORE_REQUEST": "true"}
+    html = client.post("/send_msg/", {"message": "Hi"}, **headers).content.decode()
+    assert "<html" in html  # a history restore gets the full page
+
+
+def test_messages_stack_coalesces_and_caps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(fragments, "icon", lambda *a, **kw: calls.append(kw) or "X")
+    messages = [Message(25, "Saved"), Message(25, "Saved"), Message(40, "Failed")]
+    messages += [Message(20, f"Note {i}") for i in range(5)]
+    tpl = Template("{% load fragments %}{% messages_stack limit=3 css='c' %}")
+    html = tpl.render(Context({"messages": messages}))
+    assert html.count('<div id="msg-') == 3 and "Note 1" not in html
+    assert 'class="success" data-level="success"' in html
+    assert "Saved<small>×2</small><button" in html and "Failed<button" in html
+    assert html.count("X</button>") == 3 and len(calls) == 1
+    assert calls[0]["css"] == "c" and calls[0]["pre_text"] == "Close"
+    assert tpl.render(Context({"messages": []})) == ""
+
+
+def test_fragment_stats_are_collected_per_request_and_signalled(client, settings):
+    settings.MIDDLEWARE = [
+        *settings.MIDDLEWARE,
+        "django_fragments.middleware.FragmentStatsMiddleware",
+    ]  # noqa: E501
+    received = []
+    cache.clear()  # else the nav, with themer, comes from {% fragment_cache %}
+
+    def receiver(sender, request, stats, **kwargs):
+        received.append((request.path, stats.summary()))
+
+    fragments_measured.connect(receiver)
+    try:
+        client.get("/about/")
+    finally:
+        fragments_measured.disconnect(receiver)
+    ((path, summary),) = received
+    assert path == "/about/" and {"themer", "icon", "messages_stack"} <= set(summary)
+    assert summary["messages_stack"]["calls"] == 1
+    assert summary["messages_stack"]["bytes"] > 0
+    assert summary["icon"]["p95_ms"] <= summary["icon"]["total_ms"]
+    assert summary["navmenu"]["hit_rate"] is not None
+    with collect() as stats:
+        pass
+    assert stats.summary() == {}
+
+
+def test_fragment_stats_count_each_request_own_cache_lookups():
+    urls.clear()
+    started, results = threading.Barrier(2), {}
+
+    def request(rounds: int):
+        with collect() as stats:
+            started.wait()
+            for _ in range(rounds):
+                fragments.nava("test_fragments:about")
+                fragments.navmenu(
+                    Context(), "test_fragments:about|About", "admin:index"
+                )
+        results[rounds] = stats
+
+    threads = [threading.Thread(target=request, args=(n,)) for n in (1, 50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for rounds, stats in results.items():
+        nava, navmenu = stats.tags["nava"], stats.tags["navmenu"]
+        assert nava.hits + nava.misses == rounds
+        assert navmenu.hits + navmenu.misses == 2 * rounds
+        shared = stats.cache_summary()["urls"]  # once, not under each tag
+        assert shared["hits"] + shared["misses"] == 3 * rounds
+        assert stats.summary()["navmenu"]["hit_rate"] is not None
+
+
+def test_jinja2_environment_shares_the_fragments(rf):
+    from django.template.backends.jinja2 import Jinja2
+
+    engine = Jinja2(
+        {
+            "NAME": "jinja2",
+            "DIRS": [],
+            "APP_DIRS": False,
+            "OPTIONS": {"environment": "django_fragments.jinja.environment"},
+        }
+    )
+    template = engine.from_string(
+        "{% whitespaceless %}<p class=\" a  b \">\n  {{ icon('x_mark_mini', css='c') }}"
+        "  </p>\n  {{ '# Hi'|md }}{% endwhitespaceless %}"
+        "{{ navmenu('test_fragments:about|About') }}{{ og_meta('T', desc='D') }}"
+    )
+    html = template.render({}, rf.get("/about/"))
+    assert html.startswith('<p class="a b"><svg class="c"')
+    assert "<h1>Hi</h1>" in html and "&lt;" not in html
+    assert "<li><a href='/about/' aria-current=page>About</a></li>" in html
+    assert html.endswith('<meta name="twitter:description" content="D"/>')
+    html = engine.from_string("{{ htmx_csrf() }}{{ hform(form) }}").render(
+        {"form": ContactForm()}, rf.get("/")
+    )
+    assert html.startswith('hx-headers=\'{"X-CSRFToken": "') and 'id="id_email"' in html
+
+
+IMPORT_BUDGET_MS = 50  # own code only, i.e. excluding Django and the standard library
+
+
+def test_template_library_import_budget():
+    code = (
+        "import sys\nimport django_fragments.templatetags.fragments\nimport"
+        " django_fragments.templatetags.helpers\nimport"
+        " django_fragments.templatetags.og\nprint(*[m for m in ('markdown',"
+        " 'multiprocessing', 'bs4') if m in sys.modules])"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=os.environ | {"DJANGO_SETTINGS_MODULE": "config.settings"},
+    )
+    assert result.stdout.strip() == ""  # heavy dependencies load on first use
+    own = re.findall(r"import time:\s+(\d+) \|.*\| +django_fragments\.", result.stderr)
+    assert own and sum(map(int, own)) / 1000 < IMPORT_BUDGET_MS
+
+
+def test_validate_field_keeps_only_its_cross_field_errors():
+    class Passwords(forms.Form):
+        password1 = forms.CharField()
+        password2 = forms.CharField()
+        other = forms.CharField()
+
+        def clean(self):
+            data = super().clean()
+            if data.get("password1") != data.get("password2"):
+                self.add_error("password2", "Passwords differ.")
+            self.add_error(None, "Unrelated.")
+
+    form = Passwords(data={"password1": "a", "password2": "b"})
+    assert validate_field(form, "password2").errors == []
+    bound = validate_field(form, "password2", dependencies=["password1"])
+    assert bound.errors == ["Passwords differ."]
+    assert list(form.errors) == ["password2"]
@@ -3,22 +3,136 @@ import sys
 from pathlib import Path
 
 import django
+from django.http import HttpResponse
 from django.http.request import HttpRequest
+from django.template import Template, TemplateDoesNotExist
+from django.template.context import make_context
+from django.template.loader_tags import ExtendsNode
+from django.template.response import TemplateResponse
+from django.utils.safestring import SafeString
+
+from .templatetags.helpers import FragmentNode
+from .templatetags.utils.md_blocks import preview_html, preview_oob, render_blocks
+from .templatetags.utils.md_engine import Extensions
 
 
 def is_htmx(request: HttpRequest) -> bool:
     """Determines whether or not the request should be handled differently
     because of the presence of the `HTTP_HX_REQUEST` header.
 
+    With `HtmxMiddleware`, this is `bool(request.htmx)` instead, i.e. False for a
+    history restore, which expects the full page.
+
     Args:
         request (HttpRequest): The Django request object received from the view
 
     Returns:
         bool: Whether or not `HTTP_HX_REQUEST` exists.
     """
+    if (htmx := getattr(request, "htmx", None)) is not None:
+        return bool(htmx)
     return True if request.META.get("HTTP_HX_REQUEST") else False
 
 
+def md_preview(
+    request: HttpRequest,
+    text: str,
+    exts: Extensions = ("attr_list",),
+    target: str = "md-preview",
+    param: str = "md_hashes",
+) -> HttpResponse:
+    """Respond to a live Markdown preview: an htmx request gets only the out-of-band
+    swaps for the blocks that differ from the comma-separated hashes it sent as `param`,
+    any other request the complete preview, see `{% md_preview %}`.
+
+    Args:
+        request (HttpRequest): The Django request object received from the view
+        text (str): The Markdown being edited
+        exts (Extensions, optional): As in the `md` filter. Defaults to ("attr_list",).
+        target (str, optional): The id of the preview element. Defaults to "md-preview".
+        param (str, optional): Request parameter with the hashes. Defaults to "md_hashes".
+
+    Returns:
+        HttpResponse: The html fragments
+    """  # noqa: E501
+    blocks = render_blocks(text, exts)
+    if not is_htmx(request):
+        return HttpResponse(preview_html(blocks, target))
+    data = request.POST if request.method == "POST" else request.GET
+    previous = [h for h in data.get(param, "").split(",") if h]
+    return HttpResponse(preview_oob(blocks, previous, target))
+
+
+def _fragments(tmpl: Template) -> dict[str, FragmentNode]:
+    try:
+        return tmpl._fragments
+    except AttributeError:
+        pass
+    fragments = {}
+    for node in tmpl.nodelist.get_nodes_by_type(FragmentNode):
+        fragments.setdefault(node.name, node)
+    for node in tmpl.nodelist.get_nodes_by_type(ExtendsNode):
+        parent = node.parent_name.var
+        if isinstance(parent, str) and parent != tmpl.origin.template_name:
+            for name, found in _fragments(tmpl.engine.get_template(parent)).items():
+                fragments.setdefault(name, found)
+    tmpl._fragments = fragments
+    return fragments
+
+
+def find_fragment(tmpl: Template, name: str) -> FragmentNode:
+    """The `{% fragment name %}` of a compiled template: in its own nodes, including the
+    blocks it fills, or else in the template it `{% extends %}`, if that is a constant.
+    Included templates are not searched. The fragments found are kept on the template,
+    which Django's cached loader reuses across requests."""
+    if not (node := _fragments(tmpl).get(name)):
+        raise TemplateDoesNotExist(f"{tmpl.origin.template_name}#{name}")
+    return node
+
+
+def render_fragment(
+    template, name: str, context: dict | None = None, request: HttpRequest | None = None
+) -> SafeString:
+    """Render only the `{% fragment name %}` of `template`, with the same context it
+    would get in a full render of the template, including that of context processors.
+
+    Args:
+        template: A template of the Django backend, e.g. from `get_template()`
+        name (str): The name of the fragment
+        context (dict | None, optional): The template context. Defaults to None.
+        request (HttpRequest | None, optional): For a `RequestContext`. Defaults to None.
+
+    Returns:
+        SafeString: The fragment's html
+    """  # noqa: E501
+    tmpl = getattr(template, "template", template)
+    node = find_fragment(tmpl, name)
+    context = make_context(context, request, autoescape=tmpl.engine.autoescape)
+    with context.render_context.push_state(tmpl):
+        with context.bind_template(tmpl):
+            context.template_name = tmpl.name
+            return node.nodelist.render(context)
+
+
+class FragmentTemplateResponse(TemplateResponse):
+    """A `TemplateResponse` that, for an htmx request, renders only the part of the
+    template marked `{% fragment name %}`, skipping the base template and any other
+    block; other requests get the full page from the same template.
+    """
+
+    def __init__(self, request, template, context=None, *args, fragment=None, **kw):
+        super().__init__(request, template, context, *args, **kw)
+        self.fragment = fragment
+
+    @property
+    def rendered_content(self):
+        if not (self.fragment and is_htmx(self._request)):
+            return super().rendered_content
+        template = self.resolve_template(self.template_name)
+        context = self.resolve_context(self.context_data)
+        return render_fragment(template, self.fragment, context, self._request)
+
+
 def prep_nb(base_dir_path: Path = Path().cwd()):
     sys.path.insert(0, str(base_dir_path))
     os.environ.setdefault(
@@ -1,26 +1,30 @@
 from django.contrib import messages
+from django.http import HttpResponseNotAllowed
 from django.http.request import HttpRequest
-from django.template.response import TemplateResponse
-from django.views.decorators.http import require_POST
 from django.views.generic import FormView, TemplateView
 
 from .forms import ContactForm, HTMXMessageForm
-from .utils import is_htmx
+from .mixins import AsyncInlineValidationMixin
+from .utils import FragmentTemplateResponse, is_htmx
 
 
-@require_POST
-def send_msg(request: HttpRequest):
+async def send_msg(request: HttpRequest):
+    if request.method != "POST":  # `require_POST` only wraps sync views in Django 4.2
+        return HttpResponseNotAllowed(["POST"])
     ctx = {"htmx_msg_form": HTMXMessageForm()}
     if is_htmx(request):
         if msg := request.POST.get("message"):
             level = int(request.POST.get("tag", 10))
             messages.add_message(request, level, msg)
-    return TemplateResponse(request, "msg_form.html", ctx)
+    return FragmentTemplateResponse(request, "home.html", ctx, fragment="msg_form")
 
 
 class HomePage(TemplateView):
     template_name = "home.html"
 
+    async def get(self, request: HttpRequest, *args, **kwargs):
+        return self.render_to_response(self.get_context_data(**kwargs))
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["htmx_msg_form"] = HTMXMessageForm()
@@ -30,6 +34,9 @@ class HomePage(TemplateView):
 class AboutPage(TemplateView):
     template_name = "about.html"
 
+    async def get(self, request: HttpRequest, *args, **kwargs):
+        return self.render_to_response(self.get_context_data(**kwargs))
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # uses missing.css extra tags, see https://missing.style/docs/colorways/
@@ -52,15 +59,21 @@ class AboutPage(TemplateView):
         return context
 
 
-class ContactFormView(FormView):
+class ContactFormView(AsyncInlineValidationMixin, FormView):
     template_name = "contact.html"
     form_class = ContactForm
+    hput_kls = "test"
+    hput_label_kls = "xx"
 
     def form_invalid(self, form: ContactForm):
-        return TemplateResponse(self.request, "contact.html", {"form": form})
+        return FragmentTemplateResponse(
+            self.request, "contact.html", {"form": form}, fragment="contact_form"
+        )
 
     def form_valid(self, form: ContactForm):
         if form.is_valid():
             print("Success!")
             form = ContactForm()  # reset the form
-        return TemplateResponse(self.request, "contact.html", {"form": form})
+        return FragmentTemplateResponse(
+            self.request, "contact.html", {"form": form}, fragment="contact_form"
+        )